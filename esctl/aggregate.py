@@ -0,0 +1,195 @@
+import heapq
+import math
+from array import array
+
+
+class ColumnTable:
+    """Rows stored column by column, in compact arrays.
+
+    Numeric columns are kept in `array.array`, text columns are dictionary
+    encoded : each distinct value is stored once and rows only hold its
+    position. A few hundred thousand rows then take a few megabytes, and
+    aggregations only walk flat arrays of integers. Missing numbers are
+    stored as zeros, their positions being kept in `missing`.
+    """
+
+    def __init__(self, text_columns=(), numeric_columns=()):
+        super(ColumnTable, self).__init__()
+        self.size = 0
+        self.values = dict((name, []) for name in text_columns)
+        self.codes = dict((name, array("l")) for name in text_columns)
+        self.numbers = dict((name, array("q")) for name in numeric_columns)
+        self.missing = dict((name, set()) for name in numeric_columns)
+        self._positions = dict((name, {}) for name in text_columns)
+
+    def append(self, row):
+        self.extend([row])
+
+    def extend(self, rows):
+        # Bind everything the loop needs to locals, it runs once per cell
+        text_columns = [
+            (name, self.codes[name].append, self._positions[name], values)
+            for name, values in self.values.items()
+        ]
+        numeric_columns = [
+            (name, numbers.append, self.missing[name])
+            for name, numbers in self.numbers.items()
+        ]
+
+        for row in rows:
+            get = row.get
+            for name, append, positions, values in text_columns:
+                value = get(name)
+                code = positions.get(value)
+                if code is None:
+                    code = positions[value] = len(values)
+                    values.append(value)
+                append(code)
+
+            for name, append, missing in numeric_columns:
+                value = get(name)
+                if value is None:
+                    missing.add(self.size)
+                    value = 0
+                append(int(value))
+
+            self.size += 1
+
+        return self
+
+    def row(self, position):
+        row = dict(
+            (name, self.values[name][codes[position]])
+            for name, codes in self.codes.items()
+        )
+        row.update(
+            (name, numbers[position]) for name, numbers in self.numbers.items()
+        )
+        return row
+
+    def group_by(self, column, sums=()):
+        """Return the rows count and the `sums` of each value of `column`."""
+        codes = self.codes[column]
+        groups = len(self.values[column])
+
+        counts = [0] * groups
+        for code in codes:
+            counts[code] += 1
+
+        totals = {}
+        for name in sums:
+            total = [0] * groups
+            for code, number in zip(codes, self.numbers[name]):
+                total[code] += number
+            totals[name] = total
+
+        return [
+            dict(
+                [(column, value), ("count", counts[code])]
+                + [(name, totals[name][code]) for name in sums]
+            )
+            for code, value in enumerate(self.values[column])
+        ]
+
+    def top(self, column, n):
+        """Return the `n` rows with the largest `column`."""
+        numbers = self.numbers[column]
+        positions = heapq.nlargest(
+            n, range(self.size), key=numbers.__getitem__
+        )
+        return [self.row(position) for position in positions]
+
+    def present(self, column):
+        """Return the positions and values of `column`, except missing ones."""
+        missing = self.missing[column]
+        return [
+            (position, number)
+            for position, number in enumerate(self.numbers[column])
+            if position not in missing
+        ]
+
+    def percentiles(self, column, percents):
+        """Return the values of `column` at `percents`, by nearest rank.
+
+        Missing values are left out.
+        """
+        if self.missing[column]:
+            numbers = sorted(number for _, number in self.present(column))
+        else:
+            numbers = sorted(self.numbers[column])
+        if not numbers:
+            return [None for percent in percents]
+
+        return [
+            numbers[max(int(math.ceil(percent / 100.0 * len(numbers))) - 1, 0)]
+            for percent in percents
+        ]
+
+    def outliers(self, column, threshold=3):
+        """Return the positions of the rows far above the median of `column`.
+
+        They are more than `threshold` median absolute deviations above it,
+        and are sorted from the largest. Missing values are left out.
+        """
+        numbers = self.numbers[column]
+        present = self.present(column)
+        if not present:
+            return []
+
+        (median,) = self.percentiles(column, (50,))
+        deviations = sorted(abs(number - median) for _, number in present)
+        # Equal values would make any difference an outlier
+        deviation = max(deviations[len(deviations) // 2], 1)
+
+        limit = median + threshold * deviation
+        positions = [
+            position for position, number in present if number > limit
+        ]
+        positions.sort(key=numbers.__getitem__, reverse=True)
+        return positions
+
+    def rates(self, previous, key, counters, elapsed, timestamps=None):
+        """Return the per second increase of `counters` since `previous`.
+
+        Rows are matched on their `key`, those missing from `previous` are
+        left out. `elapsed` is the number of seconds between both tables,
+        unless `timestamps` names a column of millisecond timestamps telling
+        when each row was sampled. Counters going down, like the ones of a
+        restarted node, are counted from zero.
+        """
+        previous_positions = dict(
+            (previous.values[key][code], position)
+            for position, code in enumerate(previous.codes[key])
+        )
+        keys = self.values[key]
+        matches = [
+            (position, previous_positions[keys[code]])
+            for position, code in enumerate(self.codes[key])
+            if keys[code] in previous_positions
+        ]
+
+        rows = []
+        for position, previous_position in matches:
+            duration = elapsed
+            if (
+                timestamps is not None
+                and previous.numbers[timestamps][previous_position]
+            ):
+                duration = (
+                    self.numbers[timestamps][position]
+                    - previous.numbers[timestamps][previous_position]
+                ) / 1000.0
+
+            row = dict(
+                (name, self.values[name][codes[position]])
+                for name, codes in self.codes.items()
+            )
+            for name in counters:
+                after = self.numbers[name][position]
+                before = previous.numbers[name][previous_position]
+                if after < before:
+                    before = 0
+                row[name] = (after - before) / duration if duration else 0.0
+            rows.append(row)
+
+        return rows
@@ -0,0 +1,161 @@
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+from esctl.utils import cache_directory
+
+
+class ResponseCache:
+    """On-disk cache of the responses to read-only requests.
+
+    Entries are stored in one directory per context, one file per request.
+    A file's modification time is refreshed on every hit so the least recently
+    used entries are evicted first when the cache grows over `max_size` bytes.
+    The age of a response is stored in the entry itself.
+    """
+
+    log = logging.getLogger(__name__)
+
+    # Parameters consumed by the transport, not sent to Elasticsearch
+    ignored_params = ("request_timeout", "ignore")
+
+    # POST endpoints which only read from the cluster
+    read_only_posts = (
+        "*/_search",
+        "*/_search/*",
+        "*/_msearch",
+        "*/_count",
+        "*/_mget",
+        "*/_field_caps",
+        "*/_validate/query",
+        "*/_explain/*",
+        "*/_analyze",
+        "/_cluster/allocation/explain",
+    )
+
+    def __init__(self, context_name, ttls=None, max_age=None, max_size=None):
+        super(ResponseCache, self).__init__()
+        self.path = os.path.join(cache_directory(), "responses", context_name)
+        self.max_age = max_age
+        self.max_size = max_size or 64 * 1024 * 1024
+
+        # Most specific patterns first
+        self.ttls = sorted(
+            (ttls or {}).items(), key=lambda item: len(item[0]), reverse=True
+        )
+
+    def ttl(self, url):
+        """Return how long the response to `url` can be reused, if at all."""
+        if self.max_age is not None:
+            return self.max_age
+
+        path = url.lstrip("/")
+        for pattern, ttl in self.ttls:
+            if fnmatch.fnmatch(path, pattern.lstrip("/")):
+                return ttl
+
+        return 0
+
+    def changes_state(self, method, url):
+        """Return whether the request may change what the cluster returns."""
+        if method in ("PUT", "DELETE"):
+            return True
+        if method != "POST":
+            return False
+
+        path = "/" + url.lstrip("/")
+        return not any(
+            fnmatch.fnmatch(path, pattern) for pattern in self.read_only_posts
+        )
+
+    def key(self, method, url, params, body):
+        params = dict(
+            (k, v)
+            for k, v in (params or {}).items()
+            if k not in self.ignored_params
+        )
+        request = json.dumps(
+            [method, url, params, body], sort_keys=True, default=str
+        )
+
+        return hashlib.sha1(request.encode("utf-8")).hexdigest()
+
+    def get(self, key, ttl):
+        entry = os.path.join(self.path, key)
+
+        try:
+            with open(entry, "r") as cache_file:
+                cached = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+
+        age = time.time() - cached.get("created_at", 0)
+        if age > ttl:
+            return None
+
+        self.log.debug("Using cached response ({:.0f}s old)".format(age))
+        self.touch(key)
+
+        return cached.get("response")
+
+    def set(self, key, response):
+        entry = os.path.join(self.path, key)
+        temporary_file = "{}.{}.{}".format(
+            entry, os.getpid(), threading.get_ident()
+        )
+
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(temporary_file, "w") as cache_file:
+                json.dump(
+                    {"created_at": time.time(), "response": response},
+                    cache_file,
+                )
+            os.replace(temporary_file, entry)
+        except (OSError, TypeError) as error:
+            self.log.debug("Cannot cache response : {}".format(error))
+            return
+
+        self.evict()
+
+    def touch(self, key):
+        try:
+            os.utime(os.path.join(self.path, key))
+        except OSError:
+            pass
+
+    def evict(self):
+        """Remove the least recently used entries until under `max_size`."""
+        entries = []
+        # Entries may be removed meanwhile, by `invalidate` or by another
+        # process evicting them too
+        try:
+            with os.scandir(self.path) as directory:
+                for entry in directory:
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError as error:
+            self.log.debug("Cannot evict responses : {}".format(error))
+            return
+
+        size = sum(entry[1] for entry in entries)
+        for mtime, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            size -= entry_size
+
+    def invalidate(self):
+        """Drop every cached response of the context."""
+        shutil.rmtree(self.path, ignore_errors=True)
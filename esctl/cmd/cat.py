@@ -1,6 +1,10 @@
+from elasticsearch.client.utils import _make_path
+
+from esctl.aggregate import ColumnTable
 from esctl.override import EsctlLister
 from esctl.main import Esctl
-from esctl.utils import Color, JSONFormatter, colorize
+from esctl.style import Threshold
+from esctl.utils import Color, JSONFormatter, format_bytes
 
 
 class CatAllocation(EsctlLister):
@@ -10,43 +14,135 @@ class CatAllocation(EsctlLister):
     state of disk usage.
     """
 
+    row_key = "node"
+
+    columns = [
+        ("shards"),
+        ("disk.indices"),
+        ("disk.used"),
+        ("disk.avail"),
+        ("disk.total"),
+        ("disk.percent", "Disk %"),
+        ("host"),
+        ("ip", "IP"),
+        ("node"),
+    ]
+
+    styles = [Threshold("Disk %", ((90, Color.RED), (75, Color.YELLOW)))]
+
     def take_action(self, parsed_args):
-        allocation = Esctl._es.cat.allocation(format="json")
-
-        allocation = self.transform(allocation)
-
-        return JSONFormatter(allocation).to_lister(
-            columns=[
-                ("shards"),
-                ("disk.indices"),
-                ("disk.used"),
-                ("disk.avail"),
-                ("disk.total"),
-                ("disk.percent", "Disk %"),
-                ("host"),
-                ("ip", "IP"),
-                ("node"),
-            ]
+        allocation = Esctl._es.cat.allocation(
+            **self.cat_params(parsed_args, self.columns)
         )
 
+        return JSONFormatter(allocation).to_lister(columns=self.columns)
+
     def get_parser(self, prog_name):
         parser = super().get_parser(prog_name)
         return parser
 
-    def transform(self, allocation):
-        nodes = []
 
-        for node in allocation:
-            if int(node.get("disk.percent")) > 90:
-                node["disk.percent"] = colorize(
-                    node["disk.percent"], Color.RED
-                )
+class CatShards(EsctlLister):
+    """Show shards, or aggregate them to find hot spots.
 
-            elif int(node.get("disk.percent")) > 75:
-                node["disk.percent"] = colorize(
-                    node["disk.percent"], Color.YELLOW
+    Shards are listed as they are received. With `--group-by`, they are
+    counted and summed per node, index or state, with the skew of each group
+    from the average store size. `--top` only keeps the largest shards (or
+    groups).
+    """
+
+    columns = [
+        ("index"),
+        ("shard"),
+        ("prirep", "Pri/Rep"),
+        ("state"),
+        ("docs"),
+        ("store"),
+        ("ip", "IP"),
+        ("node"),
+    ]
+
+    def take_action(self, parsed_args):
+        url = _make_path("_cat", "shards", ",".join(parsed_args.patterns))
+
+        if not parsed_args.group_by and not parsed_args.top:
+            shards = Esctl._es.transport.stream_request(
+                "GET", url, params=self.cat_params(parsed_args, self.columns)
+            )
+            return JSONFormatter(shards).to_lister(columns=self.columns)
+
+        shards = ColumnTable(
+            text_columns=("index", "shard", "prirep", "state", "ip", "node"),
+            numeric_columns=("docs", "store"),
+        ).extend(
+            Esctl._es.transport.stream_request(
+                "GET",
+                url,
+                params={
+                    "format": "json",
+                    "bytes": "b",
+                    "h": "index,shard,prirep,state,docs,store,ip,node",
+                },
+            )
+        )
+
+        if parsed_args.group_by:
+            return self.groups(shards, parsed_args.group_by, parsed_args.top)
+
+        rows = shards.top("store", parsed_args.top)
+        for row in rows:
+            row["store"] = format_bytes(row["store"])
+
+        return JSONFormatter(rows).to_lister(columns=self.columns)
+
+    def groups(self, shards, column, top=None):
+        groups = shards.group_by(column, sums=("docs", "store"))
+        groups.sort(key=lambda group: group["store"], reverse=True)
+
+        # Unassigned shards are not part of the skew
+        assigned = [group for group in groups if group[column] is not None]
+        average = sum(group["store"] for group in assigned) / (
+            len(assigned) or 1
+        )
+
+        for group in groups:
+            if group[column] is None:
+                group[column] = "-"
+                group["skew"] = ""
+            elif average:
+                group["skew"] = "{:+.1f}".format(
+                    (group["store"] - average) / average * 100
                 )
+            group["store"] = format_bytes(group["store"])
 
-            nodes.append(node)
+        columns = [
+            (column,),
+            ("count", "Shards"),
+            ("docs",),
+            ("store",),
+            ("skew", "Skew %"),
+        ]
+        return JSONFormatter(groups[:top]).to_lister(columns=columns)
 
-        return nodes
+    def get_parser(self, prog_name):
+        parser = super(CatShards, self).get_parser(prog_name)
+        parser.add_argument(
+            "patterns",
+            metavar="<pattern>",
+            nargs="*",
+            help=(
+                "Only show the shards of the indices matching these patterns"
+            ),
+        )
+        parser.add_argument(
+            "--group-by",
+            choices=["node", "index", "state"],
+            help=("Count shards and sum their docs and store per group"),
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            metavar="N",
+            help=("Only show the N largest shards (or groups)"),
+        )
+        return parser
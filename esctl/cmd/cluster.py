@@ -1,19 +1,55 @@
 import collections
+import functools
 import elasticsearch as elasticsearch
 import re
 
+from elasticsearch.client.utils import _make_path
+
 from esctl.main import Esctl
-from esctl.utils import Color, flatten_dict
+from esctl.utils import JSONFormatter, flatten_dict, gather
 from esctl.override import EsctlCommand, EsctlLister
-from esctl.cmd.settings import ClusterSettings
+from esctl.style import HEALTH_COLORS, Values
+from esctl.cmd.settings import ClusterSettings, write_changes
 
 
 class ClusterAllocationExplain(EsctlLister):
-    """Provide explanations for shard allocations in the cluster."""
+    """Provide explanations for shard allocations in the cluster.
+
+    With `--unassigned`, every unassigned shard is explained, several at a
+    time, and shards failing for the same reasons are grouped together.
+    """
+
+    # Only what is shown of each explanation is sent by the cluster
+    filter_path = [
+        "index",
+        "shard",
+        "primary",
+        "allocate_explanation",
+        "unassigned_info.reason",
+        "node_allocation_decisions.deciders.decider",
+        "node_allocation_decisions.deciders.explanation",
+    ]
 
     def take_action(self, parsed_args):
+        if parsed_args.unassigned:
+            return self.explain_all(parsed_args)
+
+        body = None
+        if parsed_args.patterns:
+            # The first unassigned shard of these indices
+            shards = self.unassigned_shards(parsed_args.patterns)
+            if not shards:
+                self.log.warn(
+                    "No unassigned shard in the indices matching {}".format(
+                        ", ".join(parsed_args.patterns)
+                    )
+                )
+                return (("Attribute", "Value"), tuple())
+            index, number, prirep = shards[0]
+            body = {"index": index, "shard": number, "primary": prirep == "p"}
+
         try:
-            response = Esctl._es.cluster.allocation_explain()
+            response = Esctl._es.cluster.allocation_explain(body=body)
         except elasticsearch.TransportError as e:
             if e.args[0] == 400:
                 error_message = e.args[2].get("error").get("reason")
@@ -40,65 +76,279 @@ class ClusterAllocationExplain(EsctlLister):
             }
 
             for node in response.get("node_allocation_decisions"):
-                output[node.get("node_name")] = node.get("deciders")[0].get(
-                    "explanation"
+                output[node.get("node_name")] = " ".join(
+                    decider.get("explanation")
+                    for decider in node.get("deciders")
                 )
 
             return (("Attribute", "Value"), tuple(output.items()))
 
+    def unassigned_shards(self, patterns):
+        shards = Esctl._es.transport.stream_request(
+            "GET",
+            _make_path("_cat", "shards", ",".join(patterns)),
+            params={"format": "json", "h": "index,shard,prirep,state"},
+        )
+        return [
+            (shard.get("index"), int(shard.get("shard")), shard.get("prirep"))
+            for shard in shards
+            if shard.get("state") == "UNASSIGNED"
+        ]
+
+    def explain(self, shard):
+        index, number, prirep = shard
+        try:
+            return Esctl._es.cluster.allocation_explain(
+                body={
+                    "index": index,
+                    "shard": number,
+                    "primary": prirep == "p",
+                },
+                filter_path=",".join(self.filter_path),
+            )
+        except elasticsearch.TransportError as error:
+            self.log.error(
+                "Cannot explain {}[{}]{} : {}".format(
+                    index, number, prirep, error
+                )
+            )
+            return None
+
+    def group(self, shards, explanations, samples=3):
+        """Group the `shards` having the same reasons not to be allocated.
+
+        The explanations of the nodes are deduplicated, the same decider
+        usually saying the same thing on many of them.
+        """
+        groups = collections.OrderedDict()
+        for (index, number, prirep), explanation in zip(shards, explanations):
+            if explanation is None:
+                continue
+
+            deciders = collections.OrderedDict()
+            for node in explanation.get("node_allocation_decisions", []):
+                for decider in node.get("deciders", []):
+                    deciders.setdefault(
+                        decider.get("decider"), decider.get("explanation")
+                    )
+
+            key = (
+                explanation.get("unassigned_info", {}).get("reason"),
+                tuple(sorted(deciders)),
+            )
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {
+                    "reason": key[0],
+                    "deciders": ", ".join(key[1]),
+                    "count": 0,
+                    "samples": [],
+                    "explanation": "\n".join(deciders.values())
+                    or explanation.get("allocate_explanation"),
+                }
+            group["count"] += 1
+            if len(group["samples"]) < samples:
+                group["samples"].append(
+                    "{}[{}]{}".format(index, number, prirep)
+                )
+
+        rows = sorted(
+            groups.values(), key=lambda group: group["count"], reverse=True
+        )
+        for row in rows:
+            row["samples"] = " ".join(row["samples"])
+
+        return rows
+
+    def explain_all(self, parsed_args):
+        shards = self.unassigned_shards(parsed_args.patterns)
+        self.log.info("Explaining {} unassigned shards".format(len(shards)))
+
+        explanations = gather(
+            *[functools.partial(self.explain, shard) for shard in shards],
+            max_workers=parsed_args.concurrency
+        )
+
+        columns = [
+            ("reason",),
+            ("deciders",),
+            ("count", "Shards"),
+            ("samples", "Sample shards"),
+            ("explanation",),
+        ]
+        return JSONFormatter(self.group(shards, explanations)).to_lister(
+            columns=columns
+        )
+
+    def get_parser(self, prog_name):
+        parser = super(ClusterAllocationExplain, self).get_parser(prog_name)
+        parser.add_argument(
+            "--unassigned",
+            action="store_true",
+            help=("Explain every unassigned shard, grouped by reason"),
+        )
+        parser.add_argument(
+            "patterns",
+            metavar="<pattern>",
+            nargs="*",
+            help=(
+                "Only explain the shards of the indices matching these "
+                "patterns (the first unassigned one without --unassigned)"
+            ),
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=8,
+            metavar="N",
+            help=("Number of shards explained at the same time (default 8)"),
+        )
+        return parser
+
 
 class ClusterHealth(EsctlLister):
     """Retrieve the cluster health."""
 
+    styles = [Values("Value", HEALTH_COLORS, where=("Attribute", "status"))]
+
     def take_action(self, parsed_args):
         health = collections.OrderedDict(
             sorted(Esctl._es.cluster.health().items())
         )
 
-        health["status"] = "{}{}{}".format(
-            *self.colorize_cluster_status(health["status"])
-        )
-
         return (("Attribute", "Value"), tuple(health.items()))
 
-    def colorize_cluster_status(self, status):
-        return (getattr(Color, status.upper(), "END"), status, Color.END)
 
+class ClusterOverview(EsctlLister):
+    """Summarize the state of the cluster in one view.
 
-class ClusterStats(EsctlLister):
-    """Retrieve the cluster status."""
+    The health, the pending tasks, the nodes using the most heap and disk and
+    the red and yellow indices are fetched at the same time, with the
+    `cluster health`, `node list`, `cat allocation` and `index list`
+    commands.
+    """
+
+    # Index names shown for each health
+    samples = 3
+    styles = ClusterHealth.styles
+
+    def run_command(self, command_class, argv):
+        """Run the `take_action` of another command, and return its rows."""
+        command = command_class(self.app, self.app_args)
+        parsed_args = command.get_parser(command_class.__name__).parse_args(
+            argv
+        )
+        column_names, data = command.take_action(parsed_args)
+        return [dict(zip(column_names, row)) for row in data]
 
     def take_action(self, parsed_args):
-        cluster_stats = self.transform(flatten_dict(Esctl._es.cluster.stats()))
-        cluster_stats = collections.OrderedDict(
-            sorted(cluster_stats.items())
+        # Only loaded by this command, not by every `cluster` one
+        from esctl.cmd.cat import CatAllocation
+        from esctl.cmd.index import IndexList
+        from esctl.cmd.node import NodeList
+
+        health, pending_tasks, nodes, allocation, red, yellow = gather(
+            functools.partial(self.run_command, ClusterHealth, []),
+            Esctl._es.cluster.pending_tasks,
+            # Sorted by the server, the last node is the most loaded one
+            functools.partial(
+                self.run_command,
+                NodeList,
+                ["-c", "Name", "-c", "Heap %", "--sort-column", "Heap %"],
+            ),
+            functools.partial(
+                self.run_command,
+                CatAllocation,
+                ["-c", "Node", "-c", "Disk %", "--sort-column", "Disk %"],
+            ),
+            functools.partial(
+                self.run_command,
+                IndexList,
+                ["-c", "Index", "--health", "red", "--sort", "index"],
+            ),
+            functools.partial(
+                self.run_command,
+                IndexList,
+                ["-c", "Index", "--health", "yellow", "--sort", "index"],
+            ),
         )
+        health = dict((row["Attribute"], row["Value"]) for row in health)
+        tasks = pending_tasks.get("tasks", [])
 
-        return (("Attribute", "Value"), tuple(cluster_stats.items()))
+        overview = collections.OrderedDict()
+        overview["cluster"] = health.get("cluster_name")
+        overview["status"] = health.get("status")
+        overview["nodes"] = "{} ({} data)".format(
+            health.get("number_of_nodes"), health.get("number_of_data_nodes")
+        )
+        overview["active shards"] = "{} ({}%)".format(
+            health.get("active_shards"),
+            health.get("active_shards_percent_as_number"),
+        )
+        for state in ("relocating", "initializing", "unassigned"):
+            overview[state + " shards"] = health.get(state + "_shards")
+        overview["pending tasks"] = len(tasks)
+        if tasks:
+            overview["oldest pending task"] = max(
+                tasks, key=lambda task: task.get("time_in_queue_millis", 0)
+            ).get("time_in_queue")
+        overview["max heap"] = self.extreme(nodes, "Name", "Heap %")
+        overview["max disk"] = self.extreme(allocation, "Node", "Disk %")
+        overview["red indices"] = self.indices(red)
+        overview["yellow indices"] = self.indices(yellow)
+
+        return (("Attribute", "Value"), tuple(overview.items()))
+
+    def extreme(self, rows, name, column):
+        """Describe the last row, of rows sorted on `column`, with a value."""
+        rows = [row for row in rows if row.get(column) is not None]
+        if not rows:
+            return None
+        return "{} ({}%)".format(rows[-1][name], rows[-1][column])
+
+    def indices(self, rows):
+        names = [row["Index"] for row in rows]
+        if not names:
+            return 0
+        sample = ", ".join(names[: self.samples])
+        if len(names) > self.samples:
+            sample += ", ..."
+        return "{} ({})".format(len(names), sample)
 
-    def objects_list_to_flat_dict(self, lst):
-        flat_dict = {}
-        for (index, element) in enumerate(lst):
-            for (attribute, value) in element.items():
-                flat_dict['[{}].{}'.format(index, attribute)] = value
 
-        return flat_dict
+class ClusterStats(EsctlLister):
+    """Retrieve the cluster status."""
 
-    def transform(self, stats):
-        for attribute, value in self.objects_list_to_flat_dict(stats.get('nodes.jvm.versions')).items():
-            stats.update({"nodes.jvm.versions{}".format(attribute): value})
+    def take_action(self, parsed_args):
+        # Lists of objects, like the JVM versions, are expanded too
+        cluster_stats = flatten_dict(
+            Esctl._es.cluster.stats(),
+            include=parsed_args.attributes or None,
+            exclude=parsed_args.exclude,
+            expand_lists=True,
+        )
+        cluster_stats = collections.OrderedDict(sorted(cluster_stats.items()))
 
-        for attribute, value in self.objects_list_to_flat_dict(stats.get('nodes.os.cpu')).items():
-            stats.update({"nodes.os.cpu{}".format(attribute): value})
-            
-        for attribute, value in self.objects_list_to_flat_dict(stats.get('nodes.plugins')).items():
-            stats.update({"nodes.plugins{}".format(attribute): value})
-                
-        del stats["nodes.jvm.versions"]
-        del stats["nodes.os.cpu"]
-        del stats["nodes.plugins"]
+        return (("Attribute", "Value"), tuple(cluster_stats.items()))
 
-        return stats
+    def get_parser(self, prog_name):
+        parser = super(ClusterStats, self).get_parser(prog_name)
+        parser.add_argument(
+            "attributes",
+            metavar="<attribute>",
+            nargs="*",
+            help=(
+                "Only show the attributes matching these globs, like "
+                "`nodes.jvm.*`"
+            ),
+        )
+        parser.add_argument(
+            "--exclude",
+            metavar="<attribute>",
+            action="append",
+            help=("Hide the attributes matching this glob, can be repeated"),
+        )
+        return parser
 
 
 class ClusterRoutingAllocationEnable(EsctlCommand):
@@ -114,23 +364,34 @@ class ClusterRoutingAllocationEnable(EsctlCommand):
             persistency = "persistent"
 
         self.log.debug("Persistency is " + persistency)
+        settings = {"cluster.routing.allocation.enable": parsed_args.status}
+
+        if parsed_args.dry_run:
+            write_changes(
+                self.app.stdout,
+                self.settings.diff(settings, persistency=persistency),
+            )
+            return
+
         self.log.info(
             "Changing cluster routing allocation to : {}".format(
                 parsed_args.status
             )
         )
 
-        self.settings.set(
-            "cluster.routing.allocation.enable",
-            parsed_args.status,
-            persistency=persistency,
-        )
+        if not self.settings.set_many(settings, persistency=persistency):
+            return 1
 
     def get_parser(self, prog_name):
         parser = super().get_parser(prog_name)
         parser.add_argument(
             "status", metavar="<status>", help=("Routing allocation status")
         )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help=("Only show how the current value would change"),
+        )
         persistency_group = parser.add_mutually_exclusive_group()
         persistency_group.add_argument(
             "--transient",
@@ -6,6 +6,8 @@ from esctl.utils import JSONFormatter
 class ConfigContextList(EsctlLister):
     """List all contexts."""
 
+    requires_es_client = False
+
     def take_action(self, parsed_args):
         contexts = []
 
@@ -1,3 +1,14 @@
+import collections
+import itertools
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import elasticsearch
+from elasticsearch.client.utils import _make_path
+from elasticsearch.compat import quote
+
+from esctl.aggregate import ColumnTable
 from esctl.override import EsctlCommand, EsctlLister
 from esctl.cmd.settings import IndexSettings
 from esctl.main import Esctl
@@ -24,75 +35,367 @@ class IndexCreate(EsctlCommand):
 
 
 class IndexList(EsctlLister):
-    """List all indices."""
+    """List all indices.
+
+    With `--rate`, shows how fast documents are indexed in and searched on
+    each index instead, the busiest first.
+    """
 
     settings = IndexSettings()
+    # `--status` values and the wildcards they expand to
+    statuses = {"open": "open", "close": "closed"}
+    columns = [
+        ("index"),
+        ("health",),
+        ("status"),
+        ("uuid", "UUID"),
+        ("pri", "Primary"),
+        ("rep", "Replica"),
+        ("docs.count"),
+        ("docs.deleted"),
+        ("store.size"),
+        ("pri.store.size", "Primary Store Size"),
+    ]
+    rate_counters = collections.OrderedDict(
+        [
+            ("indexing.index_total", "Index/s"),
+            ("search.query_total", "Search/s"),
+        ]
+    )
 
     def take_action(self, parsed_args):
-        indices = Esctl._es.cat.indices(format="json")
+        # Like cliff does for unknown columns
+        if parsed_args.sort and parsed_args.sort_columns:
+            raise ValueError(
+                "--sort and --sort-column cannot be used together"
+            )
+        if parsed_args.batch_size and not parsed_args.patterns:
+            raise ValueError("--batch-size requires index patterns")
+
+        params = self.cat_params(parsed_args, self.columns)
+
+        if parsed_args.health:
+            params["health"] = parsed_args.health
+        if parsed_args.status:
+            params["expand_wildcards"] = self.statuses[parsed_args.status]
+        if parsed_args.bytes:
+            params["bytes"] = parsed_args.bytes
+        if parsed_args.sort:
+            params["s"] = parsed_args.sort
+            self.sorted_by_server = True
+
+        batches = self.batches(parsed_args.patterns, parsed_args.batch_size)
+        if parsed_args.rate:
+            return self.rates(batches, params, parsed_args)
+
+        if len(batches) > 1:
+            # Each batch is only sorted on its own
+            self.sorted_by_server = False
+
+        indices = itertools.chain.from_iterable(
+            Esctl._es.transport.stream_request(
+                "GET", _make_path("_cat", "indices", batch), params=params
+            )
+            for batch in batches
+        )
+        if parsed_args.limit is not None:
+            indices = itertools.islice(indices, parsed_args.limit)
+
         json_formatter = JSONFormatter(indices)
-        return json_formatter.to_lister(
-            columns=[
-                ("index"),
-                ("health",),
-                ("status"),
-                ("uuid", "UUID"),
-                ("pri", "Primary"),
-                ("rep", "Replica"),
-                ("docs.count"),
-                ("docs.deleted"),
-                ("store.size"),
-                ("pri.store.size", "Primary Store Size"),
-            ]
+        return json_formatter.to_lister(columns=self.columns)
+
+    def rates(self, batches, params, parsed_args):
+        params = dict(
+            params, h=",".join(("index",) + tuple(self.rate_counters))
         )
+        params.pop("s", None)
 
+        def sample():
+            return ColumnTable(
+                text_columns=("index",),
+                numeric_columns=tuple(self.rate_counters),
+            ).extend(
+                itertools.chain.from_iterable(
+                    Esctl._es.transport.stream_request(
+                        "GET",
+                        _make_path("_cat", "indices", batch),
+                        params=params,
+                    )
+                    for batch in batches
+                )
+            )
 
-class IndexClose(EsctlCommand):
-    """Close an index."""
+        # Both samples go through the same kept-alive connection
+        before = sample()
+        sampled_at = time.monotonic()
+        time.sleep(parsed_args.rate)
+        after = sample()
+        rows = after.rates(
+            before,
+            "index",
+            tuple(self.rate_counters),
+            elapsed=time.monotonic() - sampled_at,
+        )
 
-    settings = IndexSettings()
+        rows.sort(
+            key=lambda row: tuple(row[name] for name in self.rate_counters),
+            reverse=True,
+        )
+        for row in rows:
+            for counter in self.rate_counters:
+                row[counter] = round(row[counter], 1)
+        self.sorted_by_server = False
 
-    def take_action(self, parsed_args):
-        self.log.info("Closing index " + parsed_args.index)
-        Esctl._es.indices.close(index=parsed_args.index)
+        columns = [("index",)] + list(self.rate_counters.items())
+        return JSONFormatter(rows[: parsed_args.limit]).to_lister(
+            columns=columns
+        )
+
+    def batches(self, patterns, batch_size=None):
+        """Group `patterns` in comma separated batches of `batch_size`."""
+        if not patterns:
+            return [None]
+
+        batch_size = batch_size or len(patterns)
+        return [
+            ",".join(patterns[start : start + batch_size])
+            for start in range(0, len(patterns), batch_size)
+        ]
 
     def get_parser(self, prog_name):
-        parser = super(IndexClose, self).get_parser(prog_name)
+        parser = super(IndexList, self).get_parser(prog_name)
+        parser.add_argument(
+            "patterns",
+            metavar="<pattern>",
+            nargs="*",
+            help=("Only list the indices matching these patterns"),
+        )
+        parser.add_argument(
+            "--health",
+            choices=["green", "yellow", "red"],
+            help=("Only list the indices with this health"),
+        )
+        parser.add_argument(
+            "--status",
+            choices=sorted(self.statuses),
+            help=("Only list the open or the closed indices"),
+        )
+        parser.add_argument(
+            "--sort",
+            metavar="COLUMN[:desc][,...]",
+            help=(
+                "Sort on the server by these _cat/indices columns (not with "
+                "--sort-column), "
+                "e.g. store.size:desc"
+            ),
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            metavar="N",
+            help=("Only list the first N indices (or the N busiest ones)"),
+        )
+        parser.add_argument(
+            "--bytes",
+            choices=["b", "kb", "mb", "gb", "tb", "pb"],
+            help=("Unit used to display sizes"),
+        )
         parser.add_argument(
-            "index", metavar="<index>", help=("Index to close")
+            "--batch-size",
+            type=int,
+            metavar="N",
+            help=(
+                "Request the patterns N at a time rather than all at once "
+                "(rows are then sorted on the client side), only with "
+                "patterns"
+            ),
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            metavar="SECONDS",
+            help=(
+                "Sample the indices twice, SECONDS apart, and show how fast "
+                "they are indexed in and searched on"
+            ),
         )
         return parser
 
 
-class IndexDelete(EsctlCommand):
-    """Delete an index."""
+class IndexBulkCommand(EsctlCommand):
+    """Run an operation on many indices, in concurrent batches.
 
+    Names are joined in comma separated lists kept short enough for the
+    request line. When a batch fails because of some of its indices, it is
+    split in halves and retried until they are found. Any other error fails
+    the batch, and the batches not sent yet, as a whole.
+    """
+
+    completion_source = "indices"
     settings = IndexSettings()
 
-    def take_action(self, parsed_args):
-        self.log.info("Deleting index " + parsed_args.index)
-        Esctl._es.indices.delete(index=parsed_args.index)
+    # Name of the `indices` API and what it does to an index
+    action = None
+    done = None
+    # Longest list of comma separated (and quoted) names sent at once
+    max_names_length = 3000
+    # Reason of an error affecting the whole cluster, once one happened
+    cluster_error = None
 
-    def get_parser(self, prog_name):
-        parser = super(IndexDelete, self).get_parser(prog_name)
-        parser.add_argument(
-            "index", metavar="<index>", help=("Index to delete")
+    def read_indices(self, parsed_args):
+        indices = list(parsed_args.indices)
+
+        if parsed_args.from_file == "-":
+            indices.extend(sys.stdin.read().split())
+        elif parsed_args.from_file:
+            with open(parsed_args.from_file, "r") as indices_file:
+                indices.extend(indices_file.read().split())
+
+        # Drop duplicates, keeping the order
+        return list(collections.OrderedDict.fromkeys(indices))
+
+    def batches(self, indices):
+        batches = []
+        batch = []
+        length = 0
+
+        for index in indices:
+            index_length = len(quote(index, safe="*")) + 1
+            if batch and length + index_length > self.max_names_length:
+                batches.append(batch)
+                batch = []
+                length = 0
+            batch.append(index)
+            length += index_length
+
+        if batch:
+            batches.append(batch)
+
+        return batches
+
+    def run_batch(self, batch):
+        """Return the error of each index of `batch`, `None` on success."""
+        if self.cluster_error is not None:
+            return [(index, self.cluster_error) for index in batch]
+
+        self.log.info(
+            "{} {}".format(self.action.capitalize(), ",".join(batch))
         )
-        return parser
 
+        try:
+            getattr(Esctl._es.indices, self.action)(index=",".join(batch))
+        except elasticsearch.TransportError as error:
+            if not self.is_index_error(error):
+                self.cluster_error = self.error_reason(error)
+                return [(index, self.cluster_error) for index in batch]
+            if len(batch) == 1:
+                return [(batch[0], self.error_reason(error))]
+            # Split the batch until the failing indices are isolated
+            middle = len(batch) // 2
+            return self.run_batch(batch[:middle]) + self.run_batch(
+                batch[middle:]
+            )
 
-class IndexOpen(EsctlCommand):
-    """Open an index."""
+        return [(index, None) for index in batch]
 
-    settings = IndexSettings()
+    def is_index_error(self, error):
+        """Tell whether `error` is caused by some indices of the batch.
+
+        Other errors, like authentication, server or connection errors, would
+        happen again for any part of the batch.
+        """
+        if error.status_code == 404:
+            return self.error_type(error) == "index_not_found_exception"
+        return error.status_code == 400
+
+    def error_type(self, error):
+        try:
+            root_cause = error.info.get("error").get("root_cause")[0]
+        except (AttributeError, IndexError, TypeError):
+            return error.error
+        return root_cause.get("type") or error.error
+
+    def error_reason(self, error):
+        try:
+            return error.info.get("error").get("root_cause")[0].get("reason")
+        except (AttributeError, IndexError, TypeError):
+            return str(error)
 
     def take_action(self, parsed_args):
-        self.log.info("Opening index " + parsed_args.index)
-        Esctl._es.indices.open(index=parsed_args.index)
+        indices = self.read_indices(parsed_args)
+        if not indices:
+            self.log.error("No index given")
+            return 1
+
+        started_at = time.monotonic()
+        failed = 0
+        self.cluster_error = None
+
+        with ThreadPoolExecutor(
+            max_workers=parsed_args.concurrency
+        ) as executor:
+            for results in executor.map(self.run_batch, self.batches(indices)):
+                for index, error in results:
+                    if error is None:
+                        self.app.stdout.write(
+                            "{} : {}\n".format(index, self.done)
+                        )
+                    else:
+                        failed += 1
+                        self.log.error("{} : {}".format(index, error))
+
+        elapsed = time.monotonic() - started_at
+        self.app.stdout.write(
+            "{} {} of {} indices in {:.1f}s ({:.1f} indices/s)\n".format(
+                self.done.capitalize(),
+                len(indices) - failed,
+                len(indices),
+                elapsed,
+                len(indices) / elapsed if elapsed else 0,
+            )
+        )
+
+        return 1 if failed else 0
 
     def get_parser(self, prog_name):
-        parser = super(IndexOpen, self).get_parser(prog_name)
+        parser = super(IndexBulkCommand, self).get_parser(prog_name)
+        parser.add_argument(
+            "indices",
+            metavar="<index>",
+            nargs="*",
+            help=("Indices (or patterns) to {}".format(self.action)),
+        )
+        parser.add_argument(
+            "--from-file",
+            metavar="FILE",
+            help=("Also read indices from FILE, one per line ('-' for stdin)"),
+        )
         parser.add_argument(
-            "index", metavar="<index>", help=("Index to close")
+            "--concurrency",
+            type=int,
+            default=4,
+            metavar="N",
+            help=("Number of requests sent at the same time (default 4)"),
         )
         return parser
+
+
+class IndexClose(IndexBulkCommand):
+    """Close indices."""
+
+    action = "close"
+    done = "closed"
+
+
+class IndexDelete(IndexBulkCommand):
+    """Delete indices."""
+
+    action = "delete"
+    done = "deleted"
+
+
+class IndexOpen(IndexBulkCommand):
+    """Open indices."""
+
+    action = "open"
+    done = "opened"
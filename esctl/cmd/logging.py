@@ -1,10 +1,21 @@
+import collections
+
 from esctl.override import EsctlCommand
-from esctl.cmd.settings import ClusterSettings
+from esctl.cmd.settings import ClusterSettings, read_settings, write_changes
+
+LEVELS = ["TRACE", "DEBUG", "INFO", "WARN"]
+
+
+def logger_key(logger):
+    if not logger.startswith("logger"):
+        return "logger." + logger
+    return logger
 
 
 class LoggingGet(EsctlCommand):
     """Get a logger value."""
 
+    completion_source = "loggers"
     settings = ClusterSettings()
 
     def take_action(self, parsed_args):
@@ -15,20 +26,25 @@ class LoggingGet(EsctlCommand):
 
         self.log.debug("Persistency is " + persistency)
 
-        if not parsed_args.logger.startswith("logger"):
-            parsed_args.logger = "logger." + parsed_args.logger
+        # Every logger is looked up in the same settings snapshot
+        for logger in map(logger_key, parsed_args.loggers):
+            if logger.endswith(".*"):
+                levels = self.settings.find(logger, persistency=persistency)
+                for name, level in sorted(levels.items()):
+                    self.log.info("{} : {}".format(name, level))
+                continue
 
-        level = (
-            self.settings.get(parsed_args.logger, persistency=persistency)
-            or ""
-        )
+            level = self.settings.get(logger, persistency=persistency) or ""
 
-        self.log.info("{} : {}".format(str(parsed_args.logger), str(level)))
+            self.log.info("{} : {}".format(str(logger), str(level)))
 
     def get_parser(self, prog_name):
         parser = super(LoggingGet, self).get_parser(prog_name)
         parser.add_argument(
-            "logger", metavar="<logger>", help=("Logger to get value")
+            "loggers",
+            metavar="<logger>",
+            nargs="+",
+            help=("Logger to get value, or loggers like `logger.org.*`"),
         )
         persistency_group = parser.add_mutually_exclusive_group()
         persistency_group.add_argument(
@@ -47,6 +63,7 @@ class LoggingGet(EsctlCommand):
 class LoggingReset(EsctlCommand):
     """Reset a logger value."""
 
+    completion_source = "loggers"
     setting = ClusterSettings()
 
     def take_action(self, parsed_args):
@@ -57,16 +74,30 @@ class LoggingReset(EsctlCommand):
 
         self.log.debug("Persistency is " + persistency)
 
-        if not parsed_args.logger.startswith("logger"):
-            parsed_args.logger = "logger." + parsed_args.logger
+        loggers = collections.OrderedDict(
+            (logger_key(logger), None) for logger in parsed_args.loggers
+        )
+
+        if parsed_args.dry_run:
+            write_changes(
+                self.app.stdout,
+                self.setting.diff(loggers, persistency=persistency),
+            )
+            return
 
-        self.log.info("Resetting logger {}".format(parsed_args.logger))
-        self.setting.set(parsed_args.logger, None, persistency=persistency)
+        self.log.info("Resetting logger {}".format(", ".join(loggers)))
+        if not self.setting.set_many(loggers, persistency=persistency):
+            return 1
 
     def get_parser(self, prog_name):
         parser = super(LoggingReset, self).get_parser(prog_name)
         parser.add_argument(
-            "logger", metavar="<logger>", help=("Logger to set")
+            "loggers", metavar="<logger>", nargs="+", help=("Logger to set")
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help=("Only show how the current values would change"),
         )
         persistency_group = parser.add_mutually_exclusive_group()
         persistency_group.add_argument(
@@ -85,6 +116,7 @@ class LoggingReset(EsctlCommand):
 class LoggingSet(EsctlCommand):
     """Set a logger value."""
 
+    completion_source = "loggers"
     setting = ClusterSettings()
 
     def take_action(self, parsed_args):
@@ -95,29 +127,69 @@ class LoggingSet(EsctlCommand):
 
         self.log.debug("Persistency is " + persistency)
 
-        if not parsed_args.logger.startswith("logger"):
-            parsed_args.logger = "logger." + parsed_args.logger
-
-        self.log.info(
-            "Changing logger {} to {}".format(
-                parsed_args.logger, parsed_args.level
+        assignments = parsed_args.assignments
+        if len(assignments) == 2 and "=" not in "".join(assignments):
+            # The single `<logger> <level>` form
+            assignments = ["=".join(assignments)]
+
+        try:
+            levels = read_settings(assignments, parsed_args.from_file)
+        except ValueError as error:
+            self.log.critical(error)
+            return 1
+
+        loggers = collections.OrderedDict()
+        for logger, level in levels.items():
+            if level is not None:
+                level = str(level).upper()
+                if level not in LEVELS:
+                    self.log.critical(
+                        "Invalid level {} for {}, expected one of {}".format(
+                            level, logger, ", ".join(LEVELS)
+                        )
+                    )
+                    return 1
+            loggers[logger_key(logger)] = level
+
+        if not loggers:
+            self.log.critical("No logger to set")
+            return 1
+
+        if parsed_args.dry_run:
+            write_changes(
+                self.app.stdout,
+                self.setting.diff(loggers, persistency=persistency),
             )
-        )
+            return
 
-        self.setting.set(
-            parsed_args.logger, parsed_args.level, persistency=persistency
-        )
+        for logger, level in loggers.items():
+            self.log.info("Changing logger {} to {}".format(logger, level))
+        if not self.setting.set_many(loggers, persistency=persistency):
+            return 1
 
     def get_parser(self, prog_name):
         parser = super(LoggingSet, self).get_parser(prog_name)
         parser.add_argument(
-            "logger", metavar="<logger>", help=("Logger to set")
+            "assignments",
+            metavar="<logger>=<level>",
+            nargs="*",
+            help=(
+                "Loggers to set, with a level among {} (or `<logger> "
+                "<level>`)".format(", ".join(LEVELS))
+            ),
+        )
+        parser.add_argument(
+            "--from-file",
+            metavar="<file>",
+            help=(
+                "Read loggers and levels from a YAML or JSON file, - for "
+                "stdin"
+            ),
         )
         parser.add_argument(
-            "level",
-            metavar="<level>",
-            help=("Log level"),
-            choices=["TRACE", "DEBUG", "INFO", "WARN"],
+            "--dry-run",
+            action="store_true",
+            help=("Only show how the current values would change"),
         )
         persistency_group = parser.add_mutually_exclusive_group()
         persistency_group.add_argument(
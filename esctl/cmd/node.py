@@ -1,5 +1,8 @@
+import collections
 import sys
+import time
 
+from esctl.aggregate import ColumnTable
 from esctl.override import EsctlCommand, EsctlLister
 from esctl.main import Esctl
 from esctl.utils import JSONFormatter
@@ -28,21 +31,285 @@ class NodeHotThreads(EsctlCommand):
 class NodeList(EsctlLister):
     """List nodes."""
 
+    row_key = "name"
+
+    columns = [
+        ("ip", "IP"),
+        ("heap.percent", "Heap %"),
+        ("ram.percent", "RAM %"),
+        ("cpu"),
+        ("load_1m"),
+        ("load_5m"),
+        ("load_15m"),
+        ("node.role", "Role"),
+        ("master"),
+        ("name"),
+    ]
+
     def take_action(self, parsed_args):
-        nodes = Esctl._es.cat.nodes(format="json")
+        nodes = Esctl._es.cat.nodes(
+            **self.cat_params(parsed_args, self.columns)
+        )
 
         json_formatter = JSONFormatter(nodes)
-        return json_formatter.to_lister(
-            columns=[
-                ("ip", "IP"),
-                ("heap.percent", "Heap %"),
-                ("ram.percent", "RAM %"),
-                ("cpu"),
-                ("load_1m"),
-                ("load_5m"),
-                ("load_15m"),
-                ("node.role", "Role"),
-                ("master"),
-                ("name"),
-            ]
+        return json_formatter.to_lister(columns=self.columns)
+
+
+class NodeStats(EsctlLister):
+    """Summarize the resources used by the nodes.
+
+    Shows the percentiles of each metric across the nodes, and the nodes far
+    above the others. With `--group-by role`, shows the average usage and
+    the total counters of each set of roles instead. With `--rate`, shows
+    how fast the indexing, search, GC and rejection counters of each node
+    grow.
+    """
+
+    metrics = collections.OrderedDict(
+        [
+            ("heap", "Heap %"),
+            ("cpu", "CPU %"),
+            ("disk", "Disk %"),
+            ("gc", "GC ms"),
+            ("rejected", "Rejected"),
+        ]
+    )
+    # Counters since the node started, summed rather than averaged per role
+    counters = ("gc", "rejected")
+
+    rate_counters = collections.OrderedDict(
+        [
+            ("indexing", "Index/s"),
+            ("search", "Search/s"),
+            ("gc", "GC ms/s"),
+            ("rejected", "Rejected/s"),
+        ]
+    )
+
+    # The letters used by `_cat/nodes`
+    role_letters = {
+        "data": "d",
+        "data_cold": "c",
+        "data_content": "s",
+        "data_frozen": "f",
+        "data_hot": "h",
+        "data_warm": "w",
+        "ingest": "i",
+        "master": "m",
+        "ml": "l",
+        "remote_cluster_client": "r",
+        "transform": "t",
+        "voting_only": "v",
+    }
+
+    # Only the fields used are sent by the cluster
+    filter_path = [
+        "nodes.*.name",
+        "nodes.*.roles",
+        "nodes.*.jvm.mem.heap_used_percent",
+        "nodes.*.jvm.gc.collectors.*.collection_time_in_millis",
+        "nodes.*.os.cpu.percent",
+        "nodes.*.fs.total.total_in_bytes",
+        "nodes.*.fs.total.available_in_bytes",
+        "nodes.*.thread_pool.*.rejected",
+    ]
+    rate_filter_path = [
+        "nodes.*.name",
+        "nodes.*.roles",
+        "nodes.*.timestamp",
+        "nodes.*.indices.indexing.index_total",
+        "nodes.*.indices.search.query_total",
+        "nodes.*.jvm.gc.collectors.*.collection_time_in_millis",
+        "nodes.*.thread_pool.*.rejected",
+    ]
+
+    def take_action(self, parsed_args):
+        if parsed_args.rate:
+            return self.rates(parsed_args.rate)
+
+        stats = Esctl._es.nodes.stats(
+            metric="jvm,os,fs,thread_pool",
+            filter_path=",".join(self.filter_path),
+        )
+
+        nodes = ColumnTable(
+            text_columns=("name", "role"), numeric_columns=tuple(self.metrics)
+        ).extend(
+            self.node_metrics(node)
+            for node in (stats.get("nodes") or {}).values()
+        )
+
+        if parsed_args.group_by == "role":
+            return self.roles(nodes)
+
+        return self.summary(nodes, parsed_args.outliers)
+
+    def node_role(self, node):
+        return (
+            "".join(
+                sorted(
+                    self.role_letters.get(role, "")
+                    for role in node.get("roles", [])
+                )
+            )
+            or "-"
+        )
+
+    def gc_time(self, node):
+        return sum(
+            collector.get("collection_time_in_millis", 0)
+            for collector in node.get("jvm", {})
+            .get("gc", {})
+            .get("collectors", {})
+            .values()
+        )
+
+    def rejections(self, node):
+        return sum(
+            pool.get("rejected", 0)
+            for pool in node.get("thread_pool", {}).values()
         )
+
+    def node_metrics(self, node):
+        disk = node.get("fs", {}).get("total", {})
+        disk_total = disk.get("total_in_bytes")
+
+        return {
+            "name": node.get("name"),
+            "role": self.node_role(node),
+            "heap": node.get("jvm", {})
+            .get("mem", {})
+            .get("heap_used_percent"),
+            "cpu": node.get("os", {}).get("cpu", {}).get("percent"),
+            "disk": (
+                100 - disk.get("available_in_bytes", 0) * 100 // disk_total
+                if disk_total
+                else None
+            ),
+            "gc": self.gc_time(node),
+            "rejected": self.rejections(node),
+        }
+
+    def node_counters(self, node):
+        indices = node.get("indices", {})
+
+        return {
+            "name": node.get("name"),
+            "role": self.node_role(node),
+            "timestamp": node.get("timestamp"),
+            "indexing": indices.get("indexing", {}).get("index_total"),
+            "search": indices.get("search", {}).get("query_total"),
+            "gc": self.gc_time(node),
+            "rejected": self.rejections(node),
+        }
+
+    def rates(self, interval):
+        def sample():
+            stats = Esctl._es.nodes.stats(
+                metric="indices,jvm,thread_pool",
+                index_metric="indexing,search",
+                filter_path=",".join(self.rate_filter_path),
+            )
+            return ColumnTable(
+                text_columns=("name", "role"),
+                numeric_columns=("timestamp",) + tuple(self.rate_counters),
+            ).extend(
+                self.node_counters(node)
+                for node in (stats.get("nodes") or {}).values()
+            )
+
+        # Both samples go through the same kept-alive connection, and each
+        # node tells when it took its own
+        before = sample()
+        sampled_at = time.monotonic()
+        time.sleep(interval)
+        after = sample()
+        rows = after.rates(
+            before,
+            "name",
+            tuple(self.rate_counters),
+            elapsed=time.monotonic() - sampled_at,
+            timestamps="timestamp",
+        )
+
+        rows.sort(key=lambda row: row["indexing"], reverse=True)
+        for row in rows:
+            for counter in self.rate_counters:
+                row[counter] = round(row[counter], 1)
+
+        columns = [("name",), ("role",)] + list(self.rate_counters.items())
+        return JSONFormatter(rows).to_lister(columns=columns)
+
+    def summary(self, nodes, max_outliers):
+        rows = []
+        for metric, name in self.metrics.items():
+            row = collections.OrderedDict([("metric", name)])
+            row.update(
+                zip(
+                    ("min", "p50", "p90", "p99", "max"),
+                    nodes.percentiles(metric, (0, 50, 90, 99, 100)),
+                )
+            )
+
+            outliers = nodes.outliers(metric)
+            row["outliers"] = ", ".join(
+                "{} ({})".format(
+                    nodes.values["name"][nodes.codes["name"][position]],
+                    nodes.numbers[metric][position],
+                )
+                for position in outliers[:max_outliers]
+            )
+            if len(outliers) > max_outliers:
+                row["outliers"] += " and {} more".format(
+                    len(outliers) - max_outliers
+                )
+            rows.append(row)
+
+        columns = [
+            ("metric",),
+            ("min",),
+            ("p50", "P50"),
+            ("p90", "P90"),
+            ("p99", "P99"),
+            ("max",),
+            ("outliers",),
+        ]
+        return JSONFormatter(rows).to_lister(columns=columns)
+
+    def roles(self, nodes):
+        groups = nodes.group_by("role", sums=tuple(self.metrics))
+        for group in groups:
+            for metric in self.metrics:
+                if metric not in self.counters:
+                    group[metric] = group[metric] // group["count"]
+        groups.sort(key=lambda group: group["count"], reverse=True)
+
+        columns = [("role",), ("count", "Nodes")] + [
+            (metric, name) for metric, name in self.metrics.items()
+        ]
+        return JSONFormatter(groups).to_lister(columns=columns)
+
+    def get_parser(self, prog_name):
+        parser = super(NodeStats, self).get_parser(prog_name)
+        parser.add_argument(
+            "--group-by",
+            choices=["role"],
+            help=("Average the usage and sum the counters per set of roles"),
+        )
+        parser.add_argument(
+            "--outliers",
+            type=int,
+            default=3,
+            metavar="N",
+            help=("Name at most N outliers of each metric (default 3)"),
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            metavar="SECONDS",
+            help=(
+                "Sample the nodes twice, SECONDS apart, and show how fast "
+                "their counters grow"
+            ),
+        )
+        return parser
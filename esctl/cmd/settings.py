@@ -1,10 +1,14 @@
+import collections
+import json
 import logging
 import elasticsearch as elasticsearch
 from abc import ABC
 import sys
+import threading
 
 from box import Box
 from esctl.main import Esctl
+from esctl.utils import flatten_dict
 
 
 class Settings(ABC):
@@ -22,34 +26,202 @@ class Settings(ABC):
         raise NotImplementedError()
 
 
+class SettingsSnapshot:
+    """Flat cluster settings, indexed by key prefix.
+
+    `keys("logger")` returns the keys under `logger.` without going through
+    the thousands of default settings recent versions report.
+    """
+
+    sections = ("persistent", "transient", "defaults")
+
+    def __init__(self, settings, include_defaults=False):
+        super(SettingsSnapshot, self).__init__()
+        self.settings = dict(
+            (section, settings.get(section) or {}) for section in self.sections
+        )
+        self.include_defaults = include_defaults
+        self.prefixes = {}
+
+        for key in set(
+            key for section in self.settings.values() for key in section
+        ):
+            parts = key.split(".")
+            for length in range(1, len(parts)):
+                self.prefixes.setdefault(".".join(parts[:length]), []).append(
+                    key
+                )
+
+    def get(self, key, persistency):
+        return self.settings[persistency].get(key)
+
+    def keys(self, prefix):
+        return sorted(self.prefixes.get(prefix.rstrip("."), []))
+
+    def match(self, pattern):
+        """Return the keys matching `pattern`, a key or a `prefix.*`."""
+        if pattern.endswith(".*"):
+            return self.keys(pattern[:-2])
+        if any(pattern in section for section in self.settings.values()):
+            return [pattern]
+        return []
+
+
 class ClusterSettings(Settings):
     """Handle cluster-level settings."""
 
+    # Shared by every command of the process, dropped when settings are
+    # changed and replaced by each refresh of interactive sessions
+    snapshot = None
+    # Incremented on every change, a snapshot fetched before is stale
+    generation = 0
+    _lock = threading.Lock()
+
     def __init__(self):
         super(ClusterSettings, self).__init__()
 
+    @classmethod
+    def invalidate(cls):
+        with cls._lock:
+            cls.generation += 1
+            cls.snapshot = None
+
+    @classmethod
+    def publish(cls, snapshot, generation):
+        """Share `snapshot`, unless settings changed since `generation`."""
+        with cls._lock:
+            if cls.generation != generation:
+                return False
+            cls.snapshot = snapshot
+            return True
+
+    def get_snapshot(self, include_defaults=False):
+        snapshot = ClusterSettings.snapshot
+        if snapshot is None or (
+            include_defaults and not snapshot.include_defaults
+        ):
+            generation = ClusterSettings.generation
+            # Defaults are by far the largest part, only ask for them if
+            # needed
+            snapshot = SettingsSnapshot(
+                Esctl._es.cluster.get_settings(
+                    include_defaults=include_defaults, flat_settings=True
+                ),
+                include_defaults=include_defaults,
+            )
+            ClusterSettings.publish(snapshot, generation)
+        return snapshot
+
     def get(self, key, persistency="transient"):
-        settings = Esctl._es.cluster.get_settings(
-            include_defaults=True, flat_settings=True
-        ).get(persistency)
+        snapshot = self.get_snapshot(
+            include_defaults=persistency == "defaults"
+        )
+        value = snapshot.get(key, persistency)
 
-        if key in settings:
-            return settings.get(key).upper()
+        if value is not None:
+            return value.upper()
         else:
             self.log.error(
                 "{} does not exists in cluster settings".format(key)
             )
             return None
 
+    def find(self, pattern, persistency="transient"):
+        """Return the values of the settings matching `pattern`."""
+        snapshot = self.get_snapshot(
+            include_defaults=persistency == "defaults"
+        )
+        values = dict(
+            (key, snapshot.get(key, persistency))
+            for key in snapshot.match(pattern)
+        )
+        return dict(
+            (key, value.upper()) for key, value in values.items() if value
+        )
+
     def set(self, sections, value, persistency="transient"):
+        return self.set_many({sections: value}, persistency=persistency)
+
+    def set_many(self, settings, persistency="transient"):
+        """Change all of `settings` with a single request."""
         try:
-            Esctl._es.cluster.put_settings(
-                body={persistency: {sections: value}}
-            )
+            Esctl._es.cluster.put_settings(body={persistency: dict(settings)})
         except elasticsearch.TransportError as error:
             self.log.critical(
                 error.args[2].get("error").get("reason").capitalize()
             )
+            return False
+        finally:
+            ClusterSettings.invalidate()
+
+        return True
+
+    def diff(self, settings, persistency="transient"):
+        """Return the `(key, current, new)` values of the changed settings."""
+        snapshot = self.get_snapshot()
+        changes = []
+        for key, value in settings.items():
+            current = setting_value(snapshot.get(key, persistency))
+            value = setting_value(value)
+            if current != value:
+                changes.append((key, current, value))
+
+        return changes
+
+
+def setting_value(value):
+    """Return `value` as the cluster returns it, like `true` for `True`."""
+    if value is None or isinstance(value, str):
+        return value
+    # The way it is serialized in the request body
+    return json.dumps(value)
+
+
+def write_changes(stream, changes):
+    """Write the changes returned by `ClusterSettings.diff` to `stream`."""
+    if not changes:
+        stream.write("Nothing to change\n")
+
+    for key, current, value in changes:
+        stream.write(
+            "{} : {} -> {}\n".format(
+                key,
+                "(unset)" if current is None else current,
+                "(unset)" if value is None else value,
+            )
+        )
+
+
+def read_settings(assignments, from_file=None):
+    """Return the settings of `key=value` assignments, in order.
+
+    Settings of a YAML or JSON file (`-` for stdin) come first, nested keys
+    being flattened. An empty value resets the setting.
+    """
+    settings = collections.OrderedDict()
+
+    if from_file is not None:
+        import yaml
+
+        if from_file == "-":
+            document = yaml.safe_load(sys.stdin)
+        else:
+            with open(from_file, "r") as settings_file:
+                document = yaml.safe_load(settings_file)
+
+        if not isinstance(document, dict):
+            raise ValueError(
+                "{} does not contain a mapping of settings".format(from_file)
+            )
+        settings.update(flatten_dict(document))
+
+    for assignment in assignments:
+        key, separator, value = assignment.partition("=")
+        if not separator:
+            raise ValueError("Expected key=value, got '{}'".format(assignment))
+        settings[key.strip()] = value.strip() or None
+
+    return settings
 
 
 class IndexSettings(Settings):
@@ -62,7 +234,10 @@ class IndexSettings(Settings):
     def get(self, setting_name):
         try:
             settings = Esctl._es.indices.get_settings(
-                index=self.index, include_defaults=True, flat_settings=True
+                index=self.index,
+                name=setting_name,
+                include_defaults=True,
+                flat_settings=True,
             )
         except elasticsearch.exceptions.NotFoundError as err:
             self.log.error(
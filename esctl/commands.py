@@ -0,0 +1,28 @@
+"""Index of the commands shipped with esctl.
+
+Maps each command name to the `module:Class` implementing it. setup.py builds
+the `esctl` entry points from this mapping, and `EsctlCommandManager` reads it
+directly instead of scanning every installed distribution on startup.
+"""
+
+COMMANDS = {
+    "cat allocation": "esctl.cmd.cat:CatAllocation",
+    "cat shards": "esctl.cmd.cat:CatShards",
+    "cluster allocation explain": "esctl.cmd.cluster:ClusterAllocationExplain",
+    "cluster health": "esctl.cmd.cluster:ClusterHealth",
+    "cluster overview": "esctl.cmd.cluster:ClusterOverview",
+    "cluster routing allocation enable": "esctl.cmd.cluster:ClusterRoutingAllocationEnable",
+    "cluster stats": "esctl.cmd.cluster:ClusterStats",
+    "config context list": "esctl.cmd.config:ConfigContextList",
+    "index close": "esctl.cmd.index:IndexClose",
+    "index create": "esctl.cmd.index:IndexCreate",
+    "index delete": "esctl.cmd.index:IndexDelete",
+    "index list": "esctl.cmd.index:IndexList",
+    "index open": "esctl.cmd.index:IndexOpen",
+    "logging get": "esctl.cmd.logging:LoggingGet",
+    "logging reset": "esctl.cmd.logging:LoggingReset",
+    "logging set": "esctl.cmd.logging:LoggingSet",
+    "node hot-threads": "esctl.cmd.node:NodeHotThreads",
+    "node list": "esctl.cmd.node:NodeList",
+    "node stats": "esctl.cmd.node:NodeStats",
+}
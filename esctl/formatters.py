@@ -0,0 +1,66 @@
+"""Output formats for piping the rows of a command into other tools.
+
+Unlike the table and JSON formats, they write each row as soon as it is
+produced, so the output of a large listing starts right away and is never
+held in memory as a whole.
+"""
+
+import json
+
+from cliff.columns import FormattableColumn
+from cliff.formatters.base import ListFormatter
+
+
+def machine_readable(row):
+    return [
+        (
+            value.machine_readable()
+            if isinstance(value, FormattableColumn)
+            else value
+        )
+        for value in row
+    ]
+
+
+class NDJSONFormatter(ListFormatter):
+    """Write one JSON object per row and per line."""
+
+    def add_argument_group(self, parser):
+        pass
+
+    def emit_list(self, column_names, data, stdout, parsed_args):
+        encoder = json.JSONEncoder(default=str)
+        for row in data:
+            stdout.write(
+                encoder.encode(dict(zip(column_names, machine_readable(row))))
+                + "\n"
+            )
+
+
+class MsgpackFormatter(ListFormatter):
+    """Write one MessagePack map per row.
+
+    The maps follow each other, to be read with `msgpack.Unpacker`. Requires
+    the `msgpack` package (`pip install esctl[msgpack]`).
+    """
+
+    def add_argument_group(self, parser):
+        pass
+
+    def emit_list(self, column_names, data, stdout, parsed_args):
+        try:
+            import msgpack
+        except ImportError:
+            raise RuntimeError(
+                "The msgpack format requires the msgpack package"
+            )
+
+        packer = msgpack.Packer(default=str)
+        # Bytes are written under the text layer, once it is flushed
+        stdout.flush()
+        output = getattr(stdout, "buffer", stdout)
+        for row in data:
+            output.write(
+                packer.pack(dict(zip(column_names, machine_readable(row))))
+            )
+        output.flush()
@@ -16,6 +16,7 @@
 import itertools
 import shlex
 import sys
+import time
 
 import cmd2
 
@@ -40,6 +41,7 @@ class InteractiveApp(cmd2.Cmd):
     use_rawinput = True
     doc_header = "Shell commands (type help <topic>):"
     app_cmd_header = "Application commands (type help <topic>):"
+    report_timing = False
 
     def __init__(self, parent_app, command_manager, stdin, stdout):
         self.parent_app = parent_app
@@ -56,7 +58,13 @@ class InteractiveApp(cmd2.Cmd):
             # batch/pipe mode
             self.prompt = ""
         self.command_manager = command_manager
-        cmd2.Cmd.__init__(self, "tab", stdin=stdin, stdout=stdout)
+        cmd2.Cmd.__init__(
+            self,
+            "tab",
+            stdin=stdin,
+            stdout=stdout,
+            shortcuts=dict(cmd2.DEFAULT_SHORTCUTS, **{"\\timing": "timing"}),
+        )
 
     def _split_line(self, line):
         try:
@@ -82,8 +90,35 @@ class InteractiveApp(cmd2.Cmd):
         # ['cluster allocation explain', 'allocation', 'explain']
         # which break run_subcommand()
         line_parts[0] = line_parts[0].split(" ")[0]
+
+        transport = getattr(self.parent_app._es, "transport", None)
+        if transport is not None:
+            transport.reset_request_time()
+        started_at = time.perf_counter()
+
         self.parent_app.run_subcommand(line_parts)
 
+        if self.report_timing:
+            self._print_timing(time.perf_counter() - started_at)
+
+    def _print_timing(self, elapsed):
+        transport = getattr(self.parent_app._es, "transport", None)
+        server_time = getattr(transport, "request_time", 0.0)
+        self.parent_app.stderr.write(
+            "Time: {:.1f} ms (server {:.1f} ms, client {:.1f} ms)\n".format(
+                elapsed * 1000,
+                server_time * 1000,
+                (elapsed - server_time) * 1000,
+            )
+        )
+
+    def do_timing(self, arg):
+        """Toggle the display of the time taken by each command."""
+        self.report_timing = not self.report_timing
+        self.poutput(
+            "Timing is {}.".format("on" if self.report_timing else "off")
+        )
+
     def completenames(self, text, line, begidx, endidx):
         """Tab-completion for command prefix without completer delimiter.
 
@@ -103,8 +138,37 @@ class InteractiveApp(cmd2.Cmd):
         This method does not handle options in cmd2/cliff style commands, you
         must define complete_$method to handle them.
         """
+        arguments = self._complete_argument(text, line, begidx)
+        if arguments is not None:
+            return arguments
+
         return [x[begidx:] for x in self._complete_prefix(line)]
 
+    def _complete_argument(self, text, line, begidx):
+        """Complete the argument of a command with the cluster metadata.
+
+        Commands tell what their argument is with `completion_source`, the
+        name of a :class:`~esctl.session.ClusterMetadata` attribute.
+        """
+        metadata = getattr(self.parent_app, "metadata", None)
+        if metadata is None:
+            return None
+
+        try:
+            cmd_factory, cmd_name, sub_argv = (
+                self.command_manager.find_command(shlex.split(line[:begidx]))
+            )
+        except ValueError:
+            return None
+
+        source = getattr(cmd_factory, "completion_source", None)
+        if source is None:
+            return None
+
+        return [
+            name for name in getattr(metadata, source) if name.startswith(text)
+        ]
+
     def _complete_prefix(self, prefix):
         """Returns cliff style commands with a specific prefix."""
         if not prefix:
@@ -181,10 +245,15 @@ class InteractiveApp(cmd2.Cmd):
                 statement.parsed.command = cmd_name
                 statement.parsed.args = " ".join(sub_argv)
             else:
-                # cmd2 >= 0.9.1 uses shlex and gives us a Statement.
-                statement.command = cmd_name
-                statement.argv = [cmd_name] + sub_argv
-                statement.args = " ".join(statement.argv)
+                # cmd2 >= 0.9.1 uses shlex and gives us a Statement, which
+                # later became immutable. `default` splits the line again
+                # anyway.
+                try:
+                    statement.command = cmd_name
+                    statement.argv = [cmd_name] + sub_argv
+                    statement.args = " ".join(statement.argv)
+                except AttributeError:
+                    pass
         return statement
 
     def cmdloop(self):
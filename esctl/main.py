@@ -2,18 +2,47 @@ import logging
 import sys
 import pprint
 import argparse
-import pkg_resources
-import urllib3
-import warnings
 import importlib
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
 
-from box import Box
 from cliff.app import App
-from cliff.commandmanager import CommandManager
+from cliff.lister import Lister
 
-from esctl import utils
-from esctl.interactive import InteractiveApp
-from esctl.override import EsctlTransport
+import esctl
+from esctl import trace, utils
+from esctl.override import EsctlCommandManager
+
+
+def interactive_app_factory(*args, **kwargs):
+    # cmd2 is slow to import, only pay for it when running interactively
+    from esctl.interactive import InteractiveApp
+
+    return InteractiveApp(*args, **kwargs)
+
+
+class ContextClients:
+    """Elasticsearch clients of several contexts, shared by worker threads.
+
+    Attribute lookups are forwarded to the client of the context the current
+    thread selected with `use`, so commands keep using `Esctl._es`. The
+    selection is kept in a context variable so that requests a command runs
+    concurrently with `utils.gather` target the same context.
+    """
+
+    def __init__(self, clients):
+        super(ContextClients, self).__init__()
+        self.clients = clients
+        self.selected = contextvars.ContextVar("client")
+
+    def use(self, context_name):
+        self.selected.set(self.clients[context_name])
+
+    def __getattr__(self, name):
+        return getattr(self.selected.get(), name)
 
 
 class Esctl(App):
@@ -24,13 +53,15 @@ class Esctl(App):
 
     def __init__(self):
         super(Esctl, self).__init__(
-            description=pkg_resources.require("Esctl")[0].project_name,
-            version=pkg_resources.require("Esctl")[0].version,
-            command_manager=CommandManager("esctl"),
+            description="esctl",
+            version=esctl.__version__,
+            command_manager=EsctlCommandManager("esctl"),
             deferred_help=True,
-            interactive_app_factory=InteractiveApp,
+            interactive_app_factory=interactive_app_factory,
         )
         self.interactive_mode = False
+        self.fanout_contexts = []
+        self.metadata = None
 
     def configure_logging(self):
         """Create logging handlers for any log output.
@@ -39,10 +70,6 @@ class Esctl(App):
         root_logger.setLevel(logging.DEBUG)
         logging.getLogger("elasticsearch").setLevel(logging.WARNING)
 
-        # Disable urllib's warnings
-        # See https://urllib3.readthedocs.io/en/latest/advanced-usage.html#ssl-warnings
-        urllib3.disable_warnings()
-
         # Set up logging to a file
         if self.options.log_file:
             file_handler = logging.FileHandler(filename=self.options.log_file)
@@ -126,17 +153,68 @@ class Esctl(App):
             self.LOG.fatal("Cannot load context '{}'.".format(context_name))
             sys.exit(1)
 
-    def find_scheme(self):
+    def find_scheme(self, server):
         scheme = "https"
 
-        if self.context.cluster.get("servers")[0].startswith("http"):
-            scheme = self.context.cluster.get("servers")[0].split(":")[0]
+        if server.startswith("http"):
+            scheme = server.split(":")[0]
 
-        self.LOG.debug("Using {} scheme".format(scheme))
+        self.LOG.debug("Using {} scheme for {}".format(scheme, server))
 
         return scheme
 
+    def find_fanout_contexts(self):
+        if self.options.all_contexts:
+            context_names = list(self._config.contexts.keys())
+        elif self.options.contexts:
+            context_names = [
+                name.strip()
+                for name in self.options.contexts.split(",")
+                if name.strip()
+            ]
+        else:
+            return []
+
+        contexts = []
+        for context_name in context_names:
+            try:
+                contexts.append(
+                    self._config.get_context_informations(context_name)
+                )
+            except AttributeError:
+                self.LOG.fatal(
+                    "Cannot load context '{}'.".format(context_name)
+                )
+                sys.exit(1)
+
+        return contexts
+
+    def find_servers(self, context):
+        servers = []
+
+        for server in context.cluster.get("servers"):
+            scheme = self.find_scheme(server)
+
+            if not server.startswith(scheme + "://"):
+                server = "{}://{}".format(scheme, server)
+
+            servers.append(server)
+
+        return servers
+
     def _initialize_es_client(self, servers, es_client_settings):
+        import urllib3
+        from esctl.transport import EsctlTransport
+
+        # Disable urllib's warnings
+        # See https://urllib3.readthedocs.io/en/latest/advanced-usage.html#ssl-warnings
+        urllib3.disable_warnings()
+
+        es_client_settings = {
+            **es_client_settings,
+            'transport_class': EsctlTransport,
+        }
+
         es_version = ''
         if self.options.es_version is not None:
             es_version = self.options.es_version
@@ -149,42 +227,232 @@ class Esctl(App):
 
         return elasticsearch.Elasticsearch(servers, **es_client_settings)
 
-    def initialize_app(self, argv):
-        self._config.load_configuration()
-        self.create_context()
+    def es_client_settings(self, context):
         username = None
         password = None
 
-        if self.context.user is not None:
-            username = self.context.user.get("username")
-            password = self.context.user.get("password")
+        if context.user is not None:
+            username = context.user.get("username")
+            password = context.user.get("password")
 
-        servers = self.context.cluster.get("servers")[0]
+        servers = self.find_servers(context)
 
         http_auth = (username, password) if username and password else None
 
         elasticsearch_client_kwargs = {
             'http_auth': http_auth,
-            'verify_certs': self.context.settings.get('no_check_certificate', True),
-            'scheme': self.find_scheme(),
-            'transport_class': EsctlTransport,
+            'verify_certs': context.settings.get('no_check_certificate', True),
         }
 
-        if 'max_retries' in self.context.settings:
-            elasticsearch_client_kwargs['max_retries'] = self.context.settings.get('max_retries')
+        if 'max_retries' in context.settings:
+            elasticsearch_client_kwargs['max_retries'] = context.settings.get('max_retries')
+
+        if 'timeout' in context.settings:
+            elasticsearch_client_kwargs['timeout'] = context.settings.get('timeout')
+
+        if 'connect_timeout' in context.settings:
+            elasticsearch_client_kwargs['connect_timeout'] = context.settings.get('connect_timeout')
 
-        if 'timeout' in self.context.settings:
-            elasticsearch_client_kwargs['timeout'] = self.context.settings.get('timeout')
+        if 'dead_timeout' in context.settings:
+            elasticsearch_client_kwargs['dead_timeout'] = context.settings.get('dead_timeout')
 
-        Esctl._es = self._initialize_es_client(servers, elasticsearch_client_kwargs)
+        if 'maxsize' in context.settings:
+            elasticsearch_client_kwargs['maxsize'] = context.settings.get('maxsize')
+
+        for setting in (
+            'retry_backoff', 'retry_budget', 'hedge_requests', 'http_compress'
+        ):
+            if setting in context.settings:
+                elasticsearch_client_kwargs[setting] = context.settings.get(setting)
+
+        if not self.options.no_cache and (
+            'cache_ttl' in context.settings
+            or self.options.max_age is not None
+        ):
+            from esctl.cache import ResponseCache
+
+            elasticsearch_client_kwargs['response_cache'] = ResponseCache(
+                context.name,
+                ttls=context.settings.get('cache_ttl'),
+                max_age=self.options.max_age,
+                max_size=context.settings.get('cache_size'),
+            )
+
+        return servers, elasticsearch_client_kwargs
+
+    def initialize_app(self, argv):
+        self._config.load_configuration()
+        self.create_context()
+        self.fanout_contexts = self.find_fanout_contexts()
 
     def prepare_to_run_command(self, cmd):
-        pass
+        if self.fanout_contexts and not isinstance(cmd, Lister):
+            raise RuntimeError(
+                "Running against several contexts is only supported by "
+                "commands listing data"
+            )
+
+        if self.options.trace:
+            trace.activate(trace.Tracer())
+
+        # Every command gets its own retry budget
+        for client in self.clients():
+            client.transport.reset_retry_budget()
+
+        # The client (and the elasticsearch module) is only loaded once a
+        # command needing it is about to run
+        if not getattr(cmd, "requires_es_client", False) or Esctl._es:
+            return
+
+        if self.fanout_contexts:
+            clients = {}
+            for context in self.fanout_contexts:
+                servers, kwargs = self.es_client_settings(context)
+                # A single request must not outlast the context timeout
+                kwargs['timeout'] = min(
+                    kwargs.get('timeout', self.options.context_timeout),
+                    self.options.context_timeout,
+                )
+                clients[context.name] = self._initialize_es_client(
+                    servers, kwargs
+                )
+            Esctl._es = ContextClients(clients)
+        else:
+            Esctl._es = self._initialize_es_client(
+                *self.es_client_settings(self.context)
+            )
+
+    def interact(self):
+        # Keep one warm client for the whole session
+        if not self.fanout_contexts:
+            servers, kwargs = self.es_client_settings(self.context)
+            kwargs['tcp_keepalive'] = True
+            Esctl._es = self._initialize_es_client(servers, kwargs)
+
+            from esctl.session import ClusterMetadata
+
+            self.metadata = ClusterMetadata(Esctl._es)
+            self.metadata.start()
+
+        try:
+            return super(Esctl, self).interact()
+        finally:
+            if self.metadata is not None:
+                self.metadata.stop()
+
+    def clients(self):
+        if not Esctl._es:
+            return []
+
+        if isinstance(Esctl._es, ContextClients):
+            return list(Esctl._es.clients.values())
+
+        return [Esctl._es]
+
+    def disable_response_cache(self):
+        for client in self.clients():
+            client.transport.response_cache = None
+
+    def fan_out(self, collect, parsed_args):
+        """Run `collect` concurrently against every selected context.
+
+        Returns the column names, the rows of all contexts prefixed with a
+        `Context` column, and the names of the contexts which failed or did
+        not answer within `--context-timeout` seconds.
+
+        The timeout covers all the requests of a context, retries included.
+        Contexts run in daemon threads, one not answering is abandoned and
+        does not hold up the exit.
+        """
+        from esctl.transport import deadline
+
+        timeout = self.options.context_timeout
+        started = {}
+
+        def run(context_name):
+            started[context_name] = time.monotonic()
+            if Esctl._es:
+                Esctl._es.use(context_name)
+            with deadline(timeout):
+                column_names, data = collect(parsed_args)
+                return column_names, [tuple(row) for row in data]
+
+        def work():
+            while True:
+                try:
+                    future, context_name = contexts.get_nowait()
+                except queue.Empty:
+                    return
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(run(context_name))
+                except BaseException as error:
+                    future.set_exception(error)
+
+        contexts = queue.Queue()
+        futures = {}
+        for context in self.fanout_contexts:
+            future = Future()
+            futures[future] = context.name
+            contexts.put((future, context.name))
+
+        for _ in range(min(self.options.parallel, len(futures))):
+            threading.Thread(target=work, name="context", daemon=True).start()
+        pending = set(futures)
+        failed = []
+
+        while pending:
+            deadlines = [
+                started[futures[future]] + timeout
+                for future in pending
+                if futures[future] in started
+            ]
+            wait_for = timeout
+            if deadlines:
+                wait_for = max(min(deadlines) - time.monotonic(), 0)
+            done, pending = wait(
+                pending, timeout=wait_for, return_when=FIRST_COMPLETED
+            )
+
+            now = time.monotonic()
+            for future in list(pending):
+                context_name = futures[future]
+                if (
+                    context_name in started
+                    and now - started[context_name] >= timeout
+                ):
+                    self.LOG.error(
+                        "{} : no answer after {}s".format(
+                            context_name, timeout
+                        )
+                    )
+                    failed.append(context_name)
+                    pending.remove(future)
+
+        column_names = ()
+        rows = []
+        for future, context_name in futures.items():
+            if context_name in failed:
+                continue
+            try:
+                column_names, data = future.result()
+            except Exception as error:
+                self.LOG.error("{} : {}".format(context_name, error))
+                failed.append(context_name)
+                continue
+            rows.extend((context_name,) + row for row in data)
+
+        return ("Context",) + tuple(column_names), rows, failed
 
     def clean_up(self, cmd, result, err):
         if err:
             self.LOG.debug("got an error: %s", err)
 
+        if self.options.trace and trace.active() is not None:
+            trace.active().report(self.stderr, self.options.trace_format)
+            trace.activate(None)
+
     def build_option_parser(self, description, version, argparse_kwargs=None):
         """Return an argparse option parser for this application.
 
@@ -260,7 +528,75 @@ class Esctl(App):
             help="Elasticsearch version.",
         )
 
-        parser.add_argument("--context", action="store", help="Context to use")
+        context_group = parser.add_mutually_exclusive_group()
+        context_group.add_argument(
+            "--context", action="store", help="Context to use"
+        )
+        context_group.add_argument(
+            "--contexts",
+            action="store",
+            metavar="CONTEXT[,CONTEXT...]",
+            help="Run the command concurrently against several contexts.",
+        )
+        context_group.add_argument(
+            "--all-contexts",
+            default=False,
+            action="store_true",
+            help="Run the command concurrently against every context.",
+        )
+        parser.add_argument(
+            "--parallel",
+            action="store",
+            type=int,
+            default=10,
+            help="Maximum number of contexts queried at the same time "
+            "(default 10).",
+        )
+        parser.add_argument(
+            "--context-timeout",
+            action="store",
+            type=float,
+            default=30,
+            metavar="SECONDS",
+            help="Give up on a context not answering within SECONDS "
+            "(default 30).",
+        )
+        cache_group = parser.add_mutually_exclusive_group()
+        cache_group.add_argument(
+            "--no-cache",
+            default=False,
+            action="store_true",
+            help="Do not use nor store cached responses.",
+        )
+        cache_group.add_argument(
+            "--max-age",
+            action="store",
+            type=int,
+            metavar="SECONDS",
+            help="Reuse cached responses up to SECONDS old, for any "
+            "read-only request.",
+        )
+        parser.add_argument(
+            "--trace",
+            default=False,
+            action="store_true",
+            help="Report the time spent in each request, and where the rest "
+            "of the command time went, on stderr.",
+        )
+        parser.add_argument(
+            "--trace-format",
+            action="store",
+            choices=["table", "json"],
+            default="table",
+            help="Format of the --trace report, json writes a line per "
+            "request (default table).",
+        )
+        parser.add_argument(
+            "--profile-startup",
+            default=False,
+            action="store_true",
+            help="Report the time spent importing each module.",
+        )
 
         return parser
 
@@ -1,292 +1,274 @@
+import importlib
+import io
 import logging
-import time
-import gzip
-import sys
 
 from cliff.command import Command
+from cliff.commandmanager import CommandManager
 from cliff.lister import Lister
 from cliff.show import ShowOne
-from urllib3.util.retry import Retry
-from urllib3.exceptions import (
-    ReadTimeoutError,
-    SSLError as UrllibSSLError,
-    NewConnectionError,
-)
-from elasticsearch.transport import Transport
-from elasticsearch import ConnectionError, ConnectionTimeout, SSLError
-from elasticsearch.connection import Urllib3HttpConnection
-from elasticsearch.connection_pool import ConnectionPool
-from elasticsearch.serializer import (
-    JSONSerializer,
-    Deserializer,
-    DEFAULT_SERIALIZERS,
-)
-from elasticsearch.compat import urlencode
+
+from esctl import trace
+from esctl.commands import COMMANDS
+from esctl.style import StyledFormatter
+from esctl.utils import JSONFormatter
+from esctl.watch import WatchScreen, every, highlight_changes
 
 
 class EsctlCommand(Command):
     """docstring for EsctlCommand."""
 
     log = logging.getLogger(__name__)
+    requires_es_client = True
+    # ClusterMetadata attribute completing the arguments interactively
+    completion_source = None
 
 
 class EsctlLister(Lister):
     """docstring for EsctlLister."""
 
     log = logging.getLogger(__name__)
+    requires_es_client = True
+    # Column identifying a row in `columns`, the first one by default
+    row_key = None
+    # Written row by row when the output is not a terminal
+    streaming_formatter = "csv"
+    # `esctl.style` rules, applied to tables displayed in a terminal
+    styles = []
+    styled = False
 
     def get_parser(self, prog_name):
         parser = super(EsctlLister, self).get_parser(prog_name)
         group = self._formatter_group
+        # Chosen in `run`, once we know where the output goes
+        formatter = parser._option_string_actions["--format"]
+        formatter.help = (
+            "the output format, defaults to {} ({} when the "
+            "output is not a terminal)".format(
+                formatter.default, self.streaming_formatter
+            )
+        )
+        parser.set_defaults(formatter=None)
         group.add_argument(
             "-a",
             "--attribute",
             help="specify the attribute(s) to include (comma separated).",
         )
+        parser.add_argument(
+            "--watch",
+            metavar="SECONDS",
+            type=float,
+            help="Refresh the output every SECONDS, highlighting what "
+            "changed.",
+        )
         return parser
 
+    @property
+    def need_sort_by_cliff(self):
+        # Rows merged from several contexts still have to be sorted
+        return not getattr(self, "sorted_by_server", False) or bool(
+            getattr(self.app, "fanout_contexts", None)
+        )
+
+    def cat_params(self, parsed_args, columns):
+        """Return the parameters of a `_cat` request rendered with `columns`.
+
+        Only the columns which will be displayed (all of `columns`, or the
+        ones selected with `-c`) are asked to Elasticsearch with `h`, and
+        `--sort-column` is turned into a server-side sort with `s`.
+        """
+        columns = JSONFormatter(None)._ensure_params_format(columns)
+        keys = dict((name, key) for key, name in columns)
+
+        selected = [keys[name] for name in parsed_args.columns if name in keys]
+        params = {
+            "format": "json",
+            "h": ",".join(selected or [key for key, name in columns]),
+        }
+
+        sort = [
+            keys[name] for name in parsed_args.sort_columns if name in keys
+        ]
+        if sort:
+            params["s"] = ",".join(sort)
+            self.sorted_by_server = True
+
+        return params
+
     def get_by_attribute_name(self, attribute, data):
         attribute = attribute.split(",")
         data = dict((k, v) for k, v in data)
         return tuple([(attr, data.get(attr)) for attr in attribute])
 
-    def run(self, parsed_args):
-        parsed_args = self._run_before_hooks(parsed_args)
-        self.formatter = self._formatter_plugins[parsed_args.formatter].obj
+    def collect(self, parsed_args):
         column_names, data = self.take_action(parsed_args)
 
         if "attribute" in parsed_args and parsed_args.attribute is not None:
             data = self.get_by_attribute_name(parsed_args.attribute, data)
 
+        return column_names, data
+
+    def fetch(self, parsed_args):
+        failed_contexts = []
+
+        if getattr(self.app, "fanout_contexts", None):
+            column_names, data, failed_contexts = self.app.fan_out(
+                self.collect, parsed_args
+            )
+            # Always tell which context a row comes from
+            if parsed_args.columns and "Context" not in parsed_args.columns:
+                parsed_args.columns.insert(0, "Context")
+        else:
+            column_names, data = self.collect(parsed_args)
+
         column_names, data = self._run_after_hooks(
             parsed_args, (column_names, data)
         )
-        self.produce_output(parsed_args, column_names, data)
-        return 0
 
+        return column_names, data, failed_contexts
 
-class EsctlShowOne(ShowOne):
-    """docstring for EsctlShowOne."""
+    def run(self, parsed_args):
+        parsed_args = self._run_before_hooks(parsed_args)
+        if parsed_args.formatter is None:
+            parsed_args.formatter = self.default_formatter()
+        self.formatter = self._formatter_plugins[parsed_args.formatter].obj
+        self.styled = parsed_args.formatter == "table" and self.to_terminal()
 
-    log = logging.getLogger(__name__)
+        if getattr(parsed_args, "watch", None):
+            return self.watch(parsed_args)
 
+        column_names, data, failed_contexts = self.fetch(parsed_args)
+        with trace.phase("render"):
+            self.produce_output(parsed_args, column_names, data)
+        return 1 if failed_contexts else 0
 
-class EsctlUrllib3HttpConnection(Urllib3HttpConnection):
+    def to_terminal(self):
+        stdout = self.app.stdout
+        return not hasattr(stdout, "isatty") or stdout.isatty()
 
-    log = logging.getLogger(__name__)
+    def default_formatter(self):
+        if not self.to_terminal():
+            return self.streaming_formatter
+        return self.formatter_default
 
-    def perform_request(
-        self,
-        method,
-        url,
-        params=None,
-        body=None,
-        timeout=None,
-        ignore=(),
-        headers=None,
-    ):
-        url = self.url_prefix + url
-        if params:
-            url = "%s?%s" % (url, urlencode(params))
-        full_url = self.host + url
-
-        start = time.time()
+    def produce_output(self, parsed_args, column_names, data):
+        formatter = self.formatter
+        if self.styled and self.styles:
+            self.formatter = StyledFormatter(formatter, self.styles)
         try:
-            kw = {}
-            if timeout:
-                kw["timeout"] = timeout
-
-            # in python2 we need to make sure the url and method are not
-            # unicode. Otherwise the body will be decoded into unicode too and
-            # that will fail (#133, #201).
-            if not isinstance(url, str):
-                url = url.encode("utf-8")
-            if not isinstance(method, str):
-                method = method.encode("utf-8")
-
-            request_headers = self.headers
-            if headers:
-                request_headers = request_headers.copy()
-                request_headers.update(headers)
-            if self.http_compress and body:
-                try:
-                    body = gzip.compress(body)
-                except AttributeError:
-                    # oops, Python2.7 doesn't have `gzip.compress` let's try
-                    # again
-                    body = gzip.zlib.compress(body)
-
-            try:
-                response = self.pool.urlopen(
-                    method,
-                    url,
-                    body,
-                    retries=Retry(False),
-                    headers=request_headers,
-                    **kw
-                )
-            except NewConnectionError as error:
-                self.log.error(error.args[0])
-                sys.exit(-1)
-
-            duration = time.time() - start
-            raw_data = response.data.decode("utf-8")
-        except Exception as e:
-            self.log_request_fail(
-                method, full_url, url, body, time.time() - start, exception=e
-            )
-            if isinstance(e, UrllibSSLError):
-                raise SSLError("N/A", str(e), e)
-            if isinstance(e, ReadTimeoutError):
-                raise ConnectionTimeout("TIMEOUT", str(e), e)
-            raise ConnectionError("N/A", str(e), e)
-
-        # raise errors based on http status codes, let the client handle those if needed
-        if (
-            not (200 <= response.status < 300)
-            and response.status not in ignore
-        ):
-            self.log_request_fail(
-                method,
-                full_url,
-                url,
-                body,
-                duration,
-                response.status,
-                raw_data,
+            return super(EsctlLister, self).produce_output(
+                parsed_args, column_names, data
             )
-            self._raise_error(response.status, raw_data)
+        finally:
+            self.formatter = formatter
+
+    def watch(self, parsed_args):
+        """Poll and redraw the output until interrupted.
 
-        self.log_request_success(
-            method, full_url, url, body, response.status, raw_data, duration
+        The same client, and so the same keep-alive connections, is used for
+        every poll.
+        """
+        self.app.disable_response_cache()
+        screen = WatchScreen(
+            self.app.stdout,
+            "Every {:g}s: {}".format(parsed_args.watch, self.cmd_name),
         )
+        key_index = 0
+        if self.row_key is not None:
+            columns = JSONFormatter(None)._ensure_params_format(self.columns)
+            key_index = [key for key, name in columns].index(self.row_key)
 
-        return response.status, response.getheaders(), raw_data
+        # Rows are identified by their context too when merged
+        key_indexes = (key_index,)
+        if getattr(self.app, "fanout_contexts", None):
+            key_indexes = (0, key_index + 1)
 
+        rows = []
 
-def get_host_info(node_info, host):
-    """
-    Simple callback that takes the node info from `/_cluster/nodes` and a
-    parsed connection information and return the connection information. If
-    `None` is returned this node will be skipped.
-    Useful for filtering nodes (by proximity for example) or if additional
-    information needs to be provided for the :class:`~elasticsearch.Connection`
-    class. By default master only nodes are filtered out since they shouldn't
-    typically be used for API operations.
-    :arg node_info: node information from `/_cluster/nodes`
-    :arg host: connection information (host, port) extracted from the node info
-    """
-    # ignore master only nodes
-    if node_info.get("roles", []) == ["master"]:
-        return None
-    return host
+        try:
+            for _ in every(parsed_args.watch):
+                column_names, data, _ = self.fetch(parsed_args)
+                previous_rows, rows = rows, [tuple(row) for row in data]
 
+                if screen.interactive:
+                    data = highlight_changes(previous_rows, rows, key_indexes)
+                else:
+                    data = rows
 
-class EsctlTransport(Transport):
+                output = io.StringIO()
+                stdout, self.app.stdout = self.app.stdout, output
+                try:
+                    self.produce_output(parsed_args, column_names, data)
+                finally:
+                    self.app.stdout = stdout
+
+                screen.draw(output.getvalue())
+        except KeyboardInterrupt:
+            pass
+
+        return 0
+
+
+class EsctlShowOne(ShowOne):
+    """docstring for EsctlShowOne."""
 
     log = logging.getLogger(__name__)
+    requires_es_client = True
 
+
+class LazyEntryPoint:
+    """Reference a command class by its `module:Class` path.
+
+    The module is only imported when the command is about to be run.
     """
-    Encapsulation of transport-related to logic. Handles instantiation of the
-    individual connections as well as creating a connection pool to hold them.
-    Main interface is the `perform_request` method.
+
+    def __init__(self, name, target):
+        super(LazyEntryPoint, self).__init__()
+        self.name = name
+        self.module_name, self.class_name = target.split(":")
+
+    def load(self, require=False):
+        module = importlib.import_module(self.module_name)
+        return getattr(module, self.class_name)
+
+
+class EsctlCommandManager(CommandManager):
+    """Load commands from the prebuilt index in `esctl.commands`.
+
+    Entry points registered by other distributions are only scanned when a
+    command cannot be found in the index.
     """
 
-    def __init__(
-        self,
-        hosts,
-        connection_class=EsctlUrllib3HttpConnection,
-        connection_pool_class=ConnectionPool,
-        host_info_callback=get_host_info,
-        sniff_on_start=False,
-        sniffer_timeout=None,
-        sniff_timeout=0.1,
-        sniff_on_connection_fail=False,
-        serializer=JSONSerializer(),
-        serializers=None,
-        default_mimetype="application/json",
-        max_retries=3,
-        retry_on_status=(502, 503, 504),
-        retry_on_timeout=False,
-        send_get_body_as="GET",
-        **kwargs
-    ):
-        """
-        :arg hosts: list of dictionaries, each containing keyword arguments to
-            create a `connection_class` instance
-        :arg connection_class: subclass of :class:`~elasticsearch.Connection` to use
-        :arg connection_pool_class: subclass of :class:`~elasticsearch.ConnectionPool` to use
-        :arg host_info_callback: callback responsible for taking the node information from
-            `/_cluser/nodes`, along with already extracted information, and
-            producing a list of arguments (same as `hosts` parameter)
-        :arg sniff_on_start: flag indicating whether to obtain a list of nodes
-            from the cluser at startup time
-        :arg sniffer_timeout: number of seconds between automatic sniffs
-        :arg sniff_on_connection_fail: flag controlling if connection failure triggers a sniff
-        :arg sniff_timeout: timeout used for the sniff request - it should be a
-            fast api call and we are talking potentially to more nodes so we want
-            to fail quickly. Not used during initial sniffing (if
-            ``sniff_on_start`` is on) when the connection still isn't
-            initialized.
-        :arg serializer: serializer instance
-        :arg serializers: optional dict of serializer instances that will be
-            used for deserializing data coming from the server. (key is the mimetype)
-        :arg default_mimetype: when no mimetype is specified by the server
-            response assume this mimetype, defaults to `'application/json'`
-        :arg max_retries: maximum number of retries before an exception is propagated
-        :arg retry_on_status: set of HTTP status codes on which we should retry
-            on a different node. defaults to ``(502, 503, 504)``
-        :arg retry_on_timeout: should timeout trigger a retry on different
-            node? (default `False`)
-        :arg send_get_body_as: for GET requests with body this option allows
-            you to specify an alternate way of execution for environments that
-            don't support passing bodies with GET requests. If you set this to
-            'POST' a POST method will be used instead, if to 'source' then the body
-            will be serialized and passed as a query parameter `source`.
-        Any extra keyword arguments will be passed to the `connection_class`
-        when creating and instance unless overridden by that connection's
-        options provided as part of the hosts parameter.
-        """
+    log = logging.getLogger(__name__)
+
+    def __init__(self, namespace, convert_underscores=True):
+        self._entry_points_loaded = False
+        super(EsctlCommandManager, self).__init__(
+            namespace, convert_underscores=convert_underscores
+        )
+
+    def _load_commands(self):
+        for name, target in COMMANDS.items():
+            self.commands[name] = LazyEntryPoint(name, target)
+
+    def load_entry_points(self):
+        if self._entry_points_loaded:
+            return
+
+        self.log.debug(
+            "Scanning '{}' entry points for commands".format(self.namespace)
+        )
+        indexed_commands = dict(self.commands)
+        self.load_commands(self.namespace)
+        # Keep the lazy references for the commands we already know about
+        self.commands.update(indexed_commands)
+        self._entry_points_loaded = True
+
+    def find_command(self, argv):
+        try:
+            return super(EsctlCommandManager, self).find_command(argv)
+        except ValueError:
+            if self._entry_points_loaded:
+                raise
 
-        # serialization config
-        _serializers = DEFAULT_SERIALIZERS.copy()
-        # if a serializer has been specified, use it for deserialization as well
-        _serializers[serializer.mimetype] = serializer
-        # if custom serializers map has been supplied, override the defaults with it
-        if serializers:
-            _serializers.update(serializers)
-        # create a deserializer with our config
-        self.deserializer = Deserializer(_serializers, default_mimetype)
-
-        self.max_retries = max_retries
-        self.retry_on_timeout = retry_on_timeout
-        self.retry_on_status = retry_on_status
-        self.send_get_body_as = send_get_body_as
-
-        # data serializer
-        self.serializer = serializer
-
-        # store all strategies...
-        self.connection_pool_class = connection_pool_class
-        self.connection_class = connection_class
-
-        # ...save kwargs to be passed to the connections
-        self.kwargs = kwargs
-        self.hosts = hosts
-
-        # ...and instantiate them
-        self.set_connections(hosts)
-        # retain the original connection instances for sniffing
-        self.seed_connections = self.connection_pool.connections[:]
-
-        # sniffing data
-        self.sniffer_timeout = sniffer_timeout
-        self.sniff_on_connection_fail = sniff_on_connection_fail
-        self.last_sniff = time.time()
-        self.sniff_timeout = sniff_timeout
-
-        # callback to construct host dict from data in /_cluster/nodes
-        self.host_info_callback = host_info_callback
-
-        if sniff_on_start:
-            self.sniff_hosts(True)
+        self.load_entry_points()
+        return super(EsctlCommandManager, self).find_command(argv)
@@ -0,0 +1,74 @@
+import logging
+import threading
+import time
+
+from esctl.cmd.settings import ClusterSettings, SettingsSnapshot
+from esctl.utils import gather
+
+
+class ClusterMetadata:
+    """Index and logger names of a cluster, to complete arguments.
+
+    They are refreshed by a background thread during interactive sessions,
+    so arguments can be completed without sending a request on every key
+    stroke. The first refresh also opens a connection to every node.
+    """
+
+    log = logging.getLogger(__name__)
+
+    refresh_interval = 30
+
+    def __init__(self, client, refresh_interval=None):
+        super(ClusterMetadata, self).__init__()
+        self.client = client
+        if refresh_interval is not None:
+            self.refresh_interval = refresh_interval
+
+        self.indices = []
+        self.snapshot = None
+        self.refreshed_at = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def loggers(self):
+        if self.snapshot is None:
+            return []
+        return self.snapshot.keys("logger")
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="metadata-refresh", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        self.client.transport.warm_up()
+
+        while not self._stopped.is_set():
+            try:
+                self.refresh()
+            except Exception as error:
+                self.log.debug(
+                    "Cannot refresh cluster metadata : {}".format(error)
+                )
+            self._stopped.wait(self.refresh_interval)
+
+    def refresh(self):
+        generation = ClusterSettings.generation
+        # Loggers which were changed, defaults would be hundreds of KB
+        indices, settings = gather(
+            lambda: self.client.cat.indices(format="json", h="index"),
+            lambda: self.client.cluster.get_settings(flat_settings=True),
+        )
+
+        # Each attribute is replaced at once, readers never see a partial list
+        self.indices = sorted(row.get("index") for row in indices)
+        self.snapshot = SettingsSnapshot(settings, include_defaults=False)
+        # Commands looking settings up reuse it rather than fetching them,
+        # unless they were changed while it was being fetched
+        ClusterSettings.publish(self.snapshot, generation)
+        self.refreshed_at = time.time()
@@ -0,0 +1,128 @@
+"""Console entry point, able to report the time spent importing modules.
+
+Running `esctl --profile-startup ...` installs an import hook before anything
+else is imported, so the report covers cliff, elasticsearch and the command
+modules loaded for the invocation.
+"""
+
+import sys
+import time
+
+
+class _TimedLoader:
+    """Wrap a loader to measure how long its module takes to execute."""
+
+    def __init__(self, loader, profiler):
+        self._loader = loader
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._profiler.enter(module.__name__)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler.leave(module.__name__)
+            # Do not leave the wrapper behind once the module is loaded
+            module.__loader__ = self._loader
+            if getattr(module, "__spec__", None) is not None:
+                module.__spec__.loader = self._loader
+
+
+class ImportProfiler:
+    """Record the self and cumulative import time of every module."""
+
+    def __init__(self):
+        super(ImportProfiler, self).__init__()
+        self.timings = {}
+        self._stack = []
+        self._finding = set()
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        sys.meta_path.insert(0, self)
+
+    def stop(self):
+        self.elapsed = time.perf_counter() - self.started_at
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path=None, target=None):
+        if fullname in self._finding:
+            return None
+
+        self._finding.add(fullname)
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._finding.discard(fullname)
+
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, self)
+
+        return spec
+
+    def enter(self, name):
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def leave(self, name):
+        name, started_at, children = self._stack.pop()
+        cumulative = time.perf_counter() - started_at
+        self.timings[name] = (cumulative - children, cumulative)
+
+        if self._stack:
+            self._stack[-1][2] += cumulative
+
+    def report(self, stream, limit=25):
+        imported = sum(timing[0] for timing in self.timings.values())
+        stream.write(
+            "Startup: {:.1f} ms total, {:.1f} ms importing {} modules\n".format(
+                self.elapsed * 1000, imported * 1000, len(self.timings)
+            )
+        )
+        stream.write(
+            "{:>10} {:>10}  {}\n".format("self (ms)", "cumul (ms)", "module")
+        )
+
+        timings = sorted(
+            self.timings.items(), key=lambda item: item[1][1], reverse=True
+        )
+        for name, (self_time, cumulative) in timings[:limit]:
+            stream.write(
+                "{:>10.1f} {:>10.1f}  {}\n".format(
+                    self_time * 1000, cumulative * 1000, name
+                )
+            )
+
+
+def main(argv=sys.argv[1:]):
+    profiler = None
+
+    if "--profile-startup" in argv:
+        profiler = ImportProfiler()
+        profiler.start()
+
+    from esctl.main import main as esctl_main
+
+    try:
+        return esctl_main(argv)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            profiler.report(sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,119 @@
+"""Colors applied to the cells of a table, only when it is rendered.
+
+A command declares its rules in `styles`. The values returned by
+`take_action` stay untouched: they are only colored when they are displayed
+as a table in a terminal, so sorting, `--watch` and the other formats see
+them as they were received.
+"""
+
+from esctl.utils import Color
+
+
+class Rule:
+    """Color the cells of `column`.
+
+    With `where=(column, value)`, only the rows having this value in this
+    other column are colored, like the `status` row of an Attribute / Value
+    listing.
+    """
+
+    def __init__(self, column, where=None):
+        super(Rule, self).__init__()
+        self.column = column
+        self.where = where
+
+    def color(self, value):
+        raise NotImplementedError()
+
+
+class Threshold(Rule):
+    """Color the numbers above each limit, like `((90, Color.RED),)`."""
+
+    def __init__(self, column, limits, where=None):
+        super(Threshold, self).__init__(column, where=where)
+        self.limits = sorted(limits, key=lambda limit: limit[0], reverse=True)
+
+    def color(self, value):
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+
+        for limit, color in self.limits:
+            if value > limit:
+                return color
+        return None
+
+
+class Values(Rule):
+    """Color some values, like `{"red": Color.RED}`."""
+
+    def __init__(self, column, colors, where=None):
+        super(Values, self).__init__(column, where=where)
+        self.colors = colors
+
+    def color(self, value):
+        return self.colors.get(value)
+
+
+HEALTH_COLORS = {
+    "green": Color.GREEN,
+    "yellow": Color.YELLOW,
+    "red": Color.RED,
+}
+
+
+def style_rows(column_names, rows, rules):
+    """Color the cells of `rows` matching `rules`.
+
+    Rows without any colored cell are returned as they are.
+    """
+    column_names = list(column_names)
+    compiled = []
+    for rule in rules:
+        if rule.column not in column_names:
+            continue
+        where_index = where_value = None
+        if rule.where is not None:
+            if rule.where[0] not in column_names:
+                continue
+            where_index = column_names.index(rule.where[0])
+            where_value = rule.where[1]
+        compiled.append(
+            (column_names.index(rule.column), rule, where_index, where_value)
+        )
+
+    if not compiled:
+        yield from rows
+        return
+
+    for row in rows:
+        styled = None
+        for index, rule, where_index, where_value in compiled:
+            if where_index is not None and row[where_index] != where_value:
+                continue
+            color = rule.color(row[index])
+            if color is None:
+                continue
+            if styled is None:
+                styled = list(row)
+            styled[index] = "{}{}{}".format(color, row[index], Color.END)
+
+        yield row if styled is None else styled
+
+
+class StyledFormatter:
+    """Apply `rules` to the rows, then hand them to `formatter`."""
+
+    def __init__(self, formatter, rules):
+        super(StyledFormatter, self).__init__()
+        self.formatter = formatter
+        self.rules = rules
+
+    def emit_list(self, column_names, data, stdout, parsed_args):
+        return self.formatter.emit_list(
+            column_names,
+            style_rows(column_names, data, self.rules),
+            stdout,
+            parsed_args,
+        )
@@ -0,0 +1,165 @@
+"""Timings of the requests sent, and of the client work, for `--trace`.
+
+A :class:`Tracer` is activated for the duration of a command. The transport
+records every request in it, split in phases :
+
+- `dns`, `connect` and `tls` when a new connection had to be opened,
+- `ttfb`, the time until the response headers were received,
+- `download`, the time spent reading the body,
+- `deserialize`, the time spent decoding it.
+
+The command itself records client side phases like `render`. Streamed
+responses are downloaded while they are rendered, that time is only counted
+in their request.
+"""
+
+import collections
+import contextlib
+import json
+import threading
+import time
+
+_active = None
+
+REQUEST_PHASES = ("dns", "connect", "tls", "ttfb", "download", "deserialize")
+
+
+def active():
+    return _active
+
+
+def activate(tracer):
+    global _active
+    _active = tracer
+
+
+def current_request():
+    """Return the record of the last request sent by this thread, if any."""
+    if _active is None:
+        return None
+    return getattr(_active.local, "request", None)
+
+
+def exclude(seconds):
+    """Leave `seconds`, counted in a request, out of the running phases."""
+    if _active is None:
+        return
+    local = _active.local
+    local.excluded = getattr(local, "excluded", 0) + seconds
+
+
+@contextlib.contextmanager
+def phase(name, request=False):
+    """Time the block as `name`, of the current request or of the command."""
+    tracer = _active
+    if tracer is None:
+        yield
+        return
+
+    record = current_request() if request else tracer.phases
+    started_at = time.perf_counter()
+    excluded = getattr(tracer.local, "excluded", 0)
+    try:
+        yield
+    finally:
+        if record is not None:
+            excluded = getattr(tracer.local, "excluded", 0) - excluded
+            record[name] = record.get(name, 0) + (
+                time.perf_counter() - started_at - excluded
+            )
+
+
+class Tracer:
+    """Collect the timings of a command and of the requests it sends."""
+
+    def __init__(self):
+        super(Tracer, self).__init__()
+        self.started_at = time.perf_counter()
+        self.requests = []
+        self.phases = collections.OrderedDict()
+        self.local = threading.local()
+        self._lock = threading.Lock()
+
+    def start_request(self, method, url, host):
+        record = collections.OrderedDict(
+            [("method", method), ("url", url), ("host", host)]
+        )
+        with self._lock:
+            self.requests.append(record)
+        self.local.request = record
+
+        return record
+
+    def summary(self):
+        total = time.perf_counter() - self.started_at
+        requests = sum(record.get("elapsed", 0) for record in self.requests)
+        deserialize = sum(
+            record.get("deserialize", 0) for record in self.requests
+        )
+        client = sum(self.phases.values())
+
+        summary = collections.OrderedDict(
+            [("total", total), ("requests", requests)]
+        )
+        summary["deserialize"] = deserialize
+        summary.update(self.phases)
+        summary["other"] = max(total - requests - deserialize - client, 0)
+
+        return summary
+
+    def report(self, stream, output_format="table"):
+        if output_format == "json":
+            for record in self.requests:
+                stream.write(json.dumps(dict(record, type="request")) + "\n")
+            stream.write(
+                json.dumps(dict(self.summary(), type="command")) + "\n"
+            )
+            return
+
+        def milliseconds(seconds):
+            if seconds is None:
+                return "-"
+            return "{:.1f}".format(seconds * 1000)
+
+        header = ["Request", "Status"] + list(REQUEST_PHASES)
+        header += ["Size", "Wire", "Ratio"]
+        rows = []
+        for record in self.requests:
+            ratio = None
+            if record.get("wire_size"):
+                ratio = "{:.1f}".format(record["size"] / record["wire_size"])
+            rows.append(
+                [
+                    "{} {}{}".format(
+                        record["method"], record["host"], record["url"]
+                    ),
+                    str(record.get("status", "-")),
+                ]
+                + [milliseconds(record.get(name)) for name in REQUEST_PHASES]
+                + [
+                    str(record.get("size", "-")),
+                    str(record.get("wire_size", "-")),
+                    ratio or "-",
+                ]
+            )
+
+        widths = [
+            max(len(row[column]) for row in [header] + rows)
+            for column in range(len(header))
+        ]
+        for row in [header] + rows:
+            stream.write(
+                "  ".join(
+                    cell.ljust(width) if column == 0 else cell.rjust(width)
+                    for column, (cell, width) in enumerate(zip(row, widths))
+                ).rstrip()
+                + "\n"
+            )
+
+        stream.write(
+            ", ".join(
+                "{} {} ms".format(name, milliseconds(seconds))
+                for name, seconds in self.summary().items()
+            )
+            + "\n"
+        )
@@ -0,0 +1,934 @@
+import atexit
+import collections
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import socket
+import threading
+import time
+import gzip
+import zlib
+
+from urllib3 import HTTPSConnectionPool, Timeout
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.util.retry import Retry
+from urllib3.exceptions import (
+    ConnectTimeoutError,
+    DecodeError,
+    HTTPError as UrllibHTTPError,
+    ReadTimeoutError,
+    SSLError as UrllibSSLError,
+)
+from elasticsearch.transport import Transport
+from elasticsearch import (
+    ConnectionError,
+    ConnectionTimeout,
+    SSLError,
+    TransportError,
+)
+from elasticsearch.connection import Urllib3HttpConnection
+from elasticsearch.connection_pool import ConnectionPool, ConnectionSelector
+from elasticsearch.serializer import (
+    JSONSerializer,
+    Deserializer,
+    DEFAULT_SERIALIZERS,
+)
+from elasticsearch.compat import urlencode
+
+from esctl import trace
+from esctl.utils import cache_directory, format_bytes, iter_json_array
+
+# Monotonic time by which the requests of the running task must be answered
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+@contextlib.contextmanager
+def deadline(seconds):
+    """Give the requests sent in the block `seconds`, retries included."""
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time():
+    """Return the seconds left before the deadline, `None` without one."""
+    ends_at = _deadline.get()
+    if ends_at is None:
+        return None
+    return ends_at - time.monotonic()
+
+
+class _TracedConnectionMixin:
+    """Record how long resolving, connecting and the TLS handshake took."""
+
+    def _new_conn(self):
+        record = trace.current_request()
+        if record is None:
+            return super(_TracedConnectionMixin, self)._new_conn()
+
+        started_at = time.perf_counter()
+        host = self._dns_host
+        try:
+            address = socket.getaddrinfo(
+                host, self.port, 0, socket.SOCK_STREAM
+            )[0][4][0]
+        except socket.error:
+            # Let urllib3 report the error
+            return super(_TracedConnectionMixin, self)._new_conn()
+        resolved_at = time.perf_counter()
+
+        # Connect to the address just resolved rather than resolving again
+        self._dns_host = address
+        try:
+            conn = super(_TracedConnectionMixin, self)._new_conn()
+        finally:
+            self._dns_host = host
+
+        record["dns"] = resolved_at - started_at
+        record["connect"] = time.perf_counter() - resolved_at
+
+        return conn
+
+    def connect(self):
+        started_at = time.perf_counter()
+        super(_TracedConnectionMixin, self).connect()
+
+        record = trace.current_request()
+        if record is not None and isinstance(self, HTTPSConnection):
+            record["tls"] = (
+                time.perf_counter()
+                - started_at
+                - record.get("dns", 0)
+                - record.get("connect", 0)
+            )
+
+
+class TracedHTTPConnection(_TracedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TracedHTTPSConnection(_TracedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class EsctlUrllib3HttpConnection(Urllib3HttpConnection):
+
+    log = logging.getLogger(__name__)
+
+    # Weight of the last request in the moving average of latencies
+    latency_smoothing = 0.3
+    # Number of request durations kept to compute percentiles
+    latency_samples = 50
+
+    def __init__(
+        self, *args, connect_timeout=None, tcp_keepalive=False, **kwargs
+    ):
+        super(EsctlUrllib3HttpConnection, self).__init__(*args, **kwargs)
+        self.connect_timeout = connect_timeout
+        self.latency = None
+        self.measured_at = None
+        self.samples = collections.deque(maxlen=self.latency_samples)
+
+        # Measure connection setups when tracing
+        if isinstance(self.pool, HTTPSConnectionPool):
+            self.pool.ConnectionCls = TracedHTTPSConnection
+        else:
+            self.pool.ConnectionCls = TracedHTTPConnection
+
+        if tcp_keepalive:
+            # Keep idle connections of long sessions from being dropped by
+            # firewalls and load balancers
+            self.pool.conn_kw["socket_options"] = (
+                HTTPConnection.default_socket_options
+                + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+            )
+
+    def record_latency(self, duration):
+        if self.latency is None:
+            self.latency = duration
+        else:
+            self.latency += self.latency_smoothing * (duration - self.latency)
+        self.samples.append(duration)
+        self.measured_at = time.time()
+
+    def perform_request(
+        self,
+        method,
+        url,
+        params=None,
+        body=None,
+        timeout=None,
+        ignore=(),
+        headers=None,
+        stream=False,
+    ):
+        """Perform the request, see :class:`~elasticsearch.Connection`.
+
+        When `stream` is set and the request succeeds, the body is returned as
+        an iterator over the raw chunks received, instead of a string.
+        """
+        url = self.url_prefix + url
+        if params:
+            url = "%s?%s" % (url, urlencode(params))
+        full_url = self.host + url
+
+        tracer = trace.active()
+        record = None
+        if tracer is not None:
+            record = tracer.start_request(method, url, self.host)
+
+        orig_body = body
+        start = time.perf_counter()
+        try:
+            kw = {}
+            if self.connect_timeout:
+                # Give up early on unreachable nodes so the transport can
+                # retry on another one
+                read_timeout = timeout or self.timeout
+                kw["timeout"] = Timeout(
+                    connect=min(self.connect_timeout, read_timeout),
+                    read=read_timeout,
+                )
+            elif timeout:
+                kw["timeout"] = timeout
+
+            # in python2 we need to make sure the url and method are not
+            # unicode. Otherwise the body will be decoded into unicode too and
+            # that will fail (#133, #201).
+            if not isinstance(url, str):
+                url = url.encode("utf-8")
+            if not isinstance(method, str):
+                method = method.encode("utf-8")
+
+            request_headers = self.headers
+            if headers:
+                request_headers = request_headers.copy()
+                request_headers.update(headers)
+            if self.http_compress and body:
+                body = gzip.compress(body)
+                request_headers = dict(
+                    request_headers, **{"content-encoding": "gzip"}
+                )
+
+            # The body is read separately to tell how long it took
+            response = self.pool.urlopen(
+                method,
+                url,
+                body,
+                retries=Retry(False),
+                headers=request_headers,
+                preload_content=False,
+                **kw
+            )
+
+            duration = time.perf_counter() - start
+            if record is not None:
+                record["status"] = response.status
+                record["ttfb"] = duration - sum(
+                    record.get(name, 0) for name in ("dns", "connect", "tls")
+                )
+
+            if stream and 200 <= response.status < 300:
+                raw_data = self._iter_body(
+                    response, method, url, duration, record
+                )
+            else:
+                transfer = {"size": 0, "wire_size": 0}
+                data = bytearray()
+                for chunk in self._read_chunks(response, transfer):
+                    data += chunk
+                response.release_conn()
+                if record is not None:
+                    record["download"] = time.perf_counter() - start - duration
+                    record.update(transfer)
+                duration = time.perf_counter() - start
+                self.log_transfer(method, url, transfer, duration)
+                raw_data = data.decode("utf-8")
+        except Exception as e:
+            if isinstance(e, ConnectTimeoutError):
+                # The transport will mark the node as dead and retry the
+                # request on another one, a traceback would only be noise
+                self.log.warning(
+                    "Cannot connect to {} : {}".format(self.host, e)
+                )
+            elif isinstance(e, ReadTimeoutError):
+                self.log.warning("No answer from {} : {}".format(self.host, e))
+            else:
+                self.log_request_fail(
+                    method,
+                    full_url,
+                    url,
+                    orig_body,
+                    time.perf_counter() - start,
+                    exception=e,
+                )
+            if isinstance(e, UrllibSSLError):
+                raise SSLError("N/A", str(e), e)
+            if isinstance(e, ReadTimeoutError):
+                raise ConnectionTimeout("TIMEOUT", str(e), e)
+            raise ConnectionError("N/A", str(e), e)
+
+        # raise errors based on http status codes, let the client handle those if needed
+        if (
+            not (200 <= response.status < 300)
+            and response.status not in ignore
+        ):
+            self.log_request_fail(
+                method,
+                full_url,
+                url,
+                orig_body,
+                duration,
+                response.status,
+                raw_data,
+            )
+            self._raise_error(response.status, raw_data)
+
+        if record is not None:
+            record["elapsed"] = duration
+        self.record_latency(duration)
+        self.log_request_success(
+            method,
+            full_url,
+            url,
+            orig_body,
+            response.status,
+            None if stream else raw_data,
+            duration,
+        )
+
+        return response.status, response.getheaders(), raw_data
+
+    def _read_chunks(self, response, transfer, chunk_size=64 * 1024):
+        """Yield the chunks of the body, decompressed as they are received.
+
+        urllib3 does not count the bytes of chunked responses, which
+        compressed ones usually are, so they are read raw and counted in
+        `transfer` along with the decompressed size.
+        """
+        encoding = response.headers.get("content-encoding", "").lower()
+        decompressor = None
+        if encoding == "gzip":
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == "deflate":
+            decompressor = zlib.decompressobj()
+
+        try:
+            for chunk in response.stream(chunk_size, decode_content=False):
+                transfer["wire_size"] += len(chunk)
+                if decompressor is not None:
+                    chunk = decompressor.decompress(chunk)
+                transfer["size"] += len(chunk)
+                if chunk:
+                    yield chunk
+            if decompressor is not None:
+                chunk = decompressor.flush()
+                transfer["size"] += len(chunk)
+                if chunk:
+                    yield chunk
+        except zlib.error as e:
+            raise DecodeError(
+                "Cannot decompress the {} response : {}".format(encoding, e)
+            )
+
+    def _iter_body(self, response, method, url, duration, record=None):
+        complete = False
+        transfer = {"size": 0, "wire_size": 0}
+        download = 0
+        try:
+            chunks = self._read_chunks(response, transfer)
+            while True:
+                started_at = time.perf_counter()
+                chunk = next(chunks, None)
+                # Only the reads, not the time spent by the consumer
+                download += time.perf_counter() - started_at
+                if chunk is None:
+                    break
+                yield chunk
+            complete = True
+        except ReadTimeoutError as e:
+            raise ConnectionTimeout("TIMEOUT", str(e), e)
+        except UrllibHTTPError as e:
+            raise ConnectionError("N/A", str(e), e)
+        finally:
+            if record is not None:
+                record["download"] = download
+                record["elapsed"] = record.get("elapsed", 0) + download
+                record.update(transfer)
+                # Read while the consumer was running its own phase
+                trace.exclude(download)
+            self.log_transfer(method, url, transfer, duration + download)
+            if not complete:
+                # The rest of the body would be read by the next request
+                # sent on this connection
+                response.close()
+            response.release_conn()
+
+    def log_transfer(self, method, url, transfer, duration):
+        if not self.log.isEnabledFor(logging.INFO):
+            return
+
+        compression = ""
+        if transfer["wire_size"] != transfer["size"]:
+            compression = ", {} on the wire".format(
+                format_bytes(transfer["wire_size"])
+            )
+        self.log.info(
+            "{} {}{} : {} received in {:.3f}s{}".format(
+                method,
+                self.host,
+                url,
+                format_bytes(transfer["size"]),
+                duration,
+                compression,
+            )
+        )
+
+
+def get_host_info(node_info, host):
+    """
+    Simple callback that takes the node info from `/_cluster/nodes` and a
+    parsed connection information and return the connection information. If
+    `None` is returned this node will be skipped.
+    Useful for filtering nodes (by proximity for example) or if additional
+    information needs to be provided for the :class:`~elasticsearch.Connection`
+    class. By default master only nodes are filtered out since they shouldn't
+    typically be used for API operations.
+    :arg node_info: node information from `/_cluster/nodes`
+    :arg host: connection information (host, port) extracted from the node info
+    """
+    # ignore master only nodes
+    if node_info.get("roles", []) == ["master"]:
+        return None
+    return host
+
+
+class LatencySelector(ConnectionSelector):
+    """Select the live connection which answered the fastest recently.
+
+    Connections without any measured latency are tried first, so that every
+    node gets a chance to be measured.
+    """
+
+    def select(self, connections):
+        unmeasured = [c for c in connections if c.latency is None]
+
+        if unmeasured:
+            return random.choice(unmeasured)
+
+        return min(connections, key=lambda connection: connection.latency)
+
+
+class EsctlConnectionPool(ConnectionPool):
+    """Connection pool remembering node latencies and failures across runs.
+
+    Each esctl invocation only sends a few requests, so the measured latency
+    and the dead-node timeouts are saved in the cache directory. The next
+    invocation then starts with the fastest node and skips the nodes which
+    recently failed.
+
+    The state is saved when a node is marked dead or comes back, and once at
+    exit for the latencies measured meanwhile.
+    """
+
+    log = logging.getLogger(__name__)
+
+    # Latencies measured earlier than that (in seconds) are not trusted
+    latency_ttl = 600
+    # Shared by the pools of every context, which save to the same file
+    _state_lock = threading.Lock()
+
+    def __init__(self, connections, selector_class=LatencySelector, **kwargs):
+        super(EsctlConnectionPool, self).__init__(
+            connections, selector_class=selector_class, **kwargs
+        )
+        self.state_file = os.path.join(cache_directory(), "nodes.json")
+        self.loaded_at = time.time()
+        self.load_state()
+        atexit.register(self.save_latencies)
+
+    def _read_state(self):
+        try:
+            with open(self.state_file, "r") as state_file:
+                return json.load(state_file)
+        except (OSError, ValueError):
+            return {}
+
+    def load_state(self):
+        state = self._read_state()
+        now = time.time()
+
+        for connection in self.orig_connections:
+            node = state.get(connection.host)
+            if node is None:
+                continue
+
+            if now - node.get("measured_at", 0) < self.latency_ttl:
+                connection.latency = node.get("latency")
+                connection.measured_at = node.get("measured_at")
+                connection.samples.extend(node.get("samples", []))
+
+            if node.get("dead_until", 0) > now:
+                self.log.debug(
+                    "{} failed recently, skipping it until {}".format(
+                        connection.host, time.ctime(node.get("dead_until"))
+                    )
+                )
+                self.connections.remove(connection)
+                self.dead_count[connection] = node.get("dead_count", 1)
+                self.dead.put((node.get("dead_until"), connection))
+
+    def save_state(self):
+        with self._state_lock:
+            self._save_state()
+
+    def _save_state(self):
+        state = self._read_state()
+        dead_until = dict(
+            (connection, timeout) for timeout, connection in self.dead.queue
+        )
+
+        for connection in self.orig_connections:
+            node = state.setdefault(connection.host, {})
+            if connection.latency is not None:
+                node["latency"] = connection.latency
+                node["measured_at"] = connection.measured_at
+                node["samples"] = list(connection.samples)
+            node["dead_until"] = dead_until.get(connection, 0)
+            node["dead_count"] = self.dead_count.get(connection, 0)
+
+        temporary_file = "{}.{}.{}".format(
+            self.state_file, os.getpid(), threading.get_ident()
+        )
+        try:
+            with open(temporary_file, "w") as state_file:
+                json.dump(state, state_file)
+            os.replace(temporary_file, self.state_file)
+        except OSError as error:
+            self.log.debug("Cannot save nodes state : {}".format(error))
+
+    def mark_dead(self, connection, now=None):
+        super(EsctlConnectionPool, self).mark_dead(connection, now=now)
+        self.save_state()
+
+    def mark_live(self, connection):
+        # Called after every successful request, only a node coming back
+        # changes the state
+        was_dead = connection in self.dead_count
+        super(EsctlConnectionPool, self).mark_live(connection)
+        if was_dead:
+            self.save_state()
+
+    def save_latencies(self):
+        if any(
+            (connection.measured_at or 0) >= self.loaded_at
+            for connection in self.orig_connections
+        ):
+            self.save_state()
+
+
+class EsctlTransport(Transport):
+
+    log = logging.getLogger(__name__)
+
+    """
+    Encapsulation of transport-related to logic. Handles instantiation of the
+    individual connections as well as creating a connection pool to hold them.
+    Main interface is the `perform_request` method.
+    """
+
+    def __init__(
+        self,
+        hosts,
+        connection_class=EsctlUrllib3HttpConnection,
+        connection_pool_class=EsctlConnectionPool,
+        host_info_callback=get_host_info,
+        sniff_on_start=False,
+        sniffer_timeout=None,
+        sniff_timeout=0.1,
+        sniff_on_connection_fail=False,
+        serializer=JSONSerializer(),
+        serializers=None,
+        default_mimetype="application/json",
+        max_retries=3,
+        retry_on_status=(502, 503, 504),
+        retry_on_timeout=False,
+        send_get_body_as="GET",
+        response_cache=None,
+        retry_backoff=0.1,
+        retry_budget=10,
+        hedge_requests=False,
+        **kwargs
+    ):
+        """
+        :arg hosts: list of dictionaries, each containing keyword arguments to
+            create a `connection_class` instance
+        :arg connection_class: subclass of :class:`~elasticsearch.Connection` to use
+        :arg connection_pool_class: subclass of :class:`~elasticsearch.ConnectionPool` to use
+        :arg host_info_callback: callback responsible for taking the node information from
+            `/_cluser/nodes`, along with already extracted information, and
+            producing a list of arguments (same as `hosts` parameter)
+        :arg sniff_on_start: flag indicating whether to obtain a list of nodes
+            from the cluser at startup time
+        :arg sniffer_timeout: number of seconds between automatic sniffs
+        :arg sniff_on_connection_fail: flag controlling if connection failure triggers a sniff
+        :arg sniff_timeout: timeout used for the sniff request - it should be a
+            fast api call and we are talking potentially to more nodes so we want
+            to fail quickly. Not used during initial sniffing (if
+            ``sniff_on_start`` is on) when the connection still isn't
+            initialized.
+        :arg serializer: serializer instance
+        :arg serializers: optional dict of serializer instances that will be
+            used for deserializing data coming from the server. (key is the mimetype)
+        :arg default_mimetype: when no mimetype is specified by the server
+            response assume this mimetype, defaults to `'application/json'`
+        :arg max_retries: maximum number of retries before an exception is propagated
+        :arg retry_on_status: set of HTTP status codes on which we should retry
+            on a different node. defaults to ``(502, 503, 504)``
+        :arg retry_on_timeout: should timeout trigger a retry on different
+            node? (default `False`, idempotent GET and HEAD requests are
+            always retried)
+        :arg send_get_body_as: for GET requests with body this option allows
+            you to specify an alternate way of execution for environments that
+            don't support passing bodies with GET requests. If you set this to
+            'POST' a POST method will be used instead, if to 'source' then the body
+            will be serialized and passed as a query parameter `source`.
+        :arg response_cache: optional :class:`~esctl.cache.ResponseCache`
+            instance used to reuse the responses to read-only requests
+        :arg retry_backoff: base delay in seconds before retrying, doubled on
+            each attempt and randomized (full jitter)
+        :arg retry_budget: maximum number of retries for all the requests of
+            a command, see :meth:`reset_retry_budget` (`None` for no limit)
+        :arg hedge_requests: send GET and HEAD requests which did not get an
+            answer within the 95th percentile of latencies to a second node,
+            and use the first answer
+        Any extra keyword arguments will be passed to the `connection_class`
+        when creating and instance unless overridden by that connection's
+        options provided as part of the hosts parameter.
+        """
+
+        # serialization config
+        _serializers = DEFAULT_SERIALIZERS.copy()
+        # if a serializer has been specified, use it for deserialization as well
+        _serializers[serializer.mimetype] = serializer
+        # if custom serializers map has been supplied, override the defaults with it
+        if serializers:
+            _serializers.update(serializers)
+        # create a deserializer with our config
+        self.deserializer = Deserializer(_serializers, default_mimetype)
+
+        self.max_retries = max_retries
+        self.retry_on_timeout = retry_on_timeout
+        self.retry_on_status = retry_on_status
+        self.send_get_body_as = send_get_body_as
+        self.response_cache = response_cache
+        self.retry_backoff = retry_backoff
+        self.retry_budget = retry_budget
+        self.hedge_requests = hedge_requests
+        self.retries_left = retry_budget
+        self._retries_lock = threading.Lock()
+        self._timing = threading.local()
+
+        # data serializer
+        self.serializer = serializer
+
+        # store all strategies...
+        self.connection_pool_class = connection_pool_class
+        self.connection_class = connection_class
+
+        # ...save kwargs to be passed to the connections
+        self.kwargs = kwargs
+        self.hosts = hosts
+
+        # ...and instantiate them
+        self.set_connections(hosts)
+        # retain the original connection instances for sniffing
+        self.seed_connections = self.connection_pool.connections[:]
+
+        # sniffing data
+        self.sniffer_timeout = sniffer_timeout
+        self.sniff_on_connection_fail = sniff_on_connection_fail
+        self.last_sniff = time.time()
+        self.sniff_timeout = sniff_timeout
+
+        # callback to construct host dict from data in /_cluster/nodes
+        self.host_info_callback = host_info_callback
+
+        if sniff_on_start:
+            self.sniff_hosts(True)
+
+    @property
+    def request_time(self):
+        """Seconds the current thread spent waiting for the cluster."""
+        return getattr(self._timing, "total", 0.0)
+
+    def reset_request_time(self):
+        self._timing.total = 0.0
+
+    def warm_up(self):
+        """Open a connection to every live node, measuring its latency."""
+        for connection in list(self.connection_pool.connections):
+            try:
+                connection.perform_request("HEAD", "/")
+            except TransportError:
+                self.mark_dead(connection)
+
+    def reset_retry_budget(self):
+        with self._retries_lock:
+            self.retries_left = self.retry_budget
+
+    def _take_retry(self):
+        with self._retries_lock:
+            if self.retries_left is None:
+                return True
+            if self.retries_left <= 0:
+                return False
+            self.retries_left -= 1
+            return True
+
+    def backoff(self, attempt):
+        """Return how long to wait before retrying, with full jitter."""
+        return random.uniform(0, min(5.0, self.retry_backoff * 2**attempt))
+
+    def hedge_delay(self):
+        """Return the 95th percentile of the latencies measured recently.
+
+        `None` until there are enough measures to tell.
+        """
+        samples = sorted(
+            sample
+            for connection in self.connection_pool.connections
+            for sample in getattr(connection, "samples", ())
+        )
+        if len(samples) < 20:
+            return None
+
+        return samples[int(len(samples) * 0.95)]
+
+    def _hedged_request(self, connection, delay, *args, **kwargs):
+        """Perform the request, racing a second node after `delay` seconds.
+
+        Returns the connection which answered first with its response.
+        Requests still running in the background are left to finish.
+        """
+        results = queue.Queue()
+
+        def run(connection):
+            try:
+                results.put(
+                    (connection, connection.perform_request(*args, **kwargs))
+                )
+            except Exception as error:
+                results.put((connection, error))
+
+        def start(connection):
+            thread = threading.Thread(target=run, args=(connection,))
+            # Do not keep the process alive for the slowest node
+            thread.daemon = True
+            thread.start()
+
+        start(connection)
+        pending = 1
+
+        try:
+            winner, result = results.get(timeout=delay)
+            pending -= 1
+        except queue.Empty:
+            others = [
+                other
+                for other in self.connection_pool.connections
+                if other is not connection
+            ]
+            if others:
+                second = self.connection_pool.selector.select(others)
+                self.log.debug(
+                    "No answer from {} after {:.0f}ms, also asking {}".format(
+                        connection.host, delay * 1000, second.host
+                    )
+                )
+                start(second)
+                pending += 1
+            winner, result = results.get()
+            pending -= 1
+
+        # A node failing to answer does not settle it while another may
+        while (
+            isinstance(result, (ConnectionError, ConnectionTimeout))
+            and pending
+        ):
+            winner, result = results.get()
+            pending -= 1
+
+        if isinstance(result, Exception):
+            raise result
+
+        return winner, result
+
+    def _send(
+        self, method, url, headers, params, body, ignore, timeout, stream
+    ):
+        """Send the request to a node, retrying on another one on failures.
+
+        Retries wait for an exponential, randomized delay, and are limited
+        by the retry budget of the running command. Within a `deadline`, each
+        attempt only gets the time left, and no retry is made once it passed.
+        """
+        idempotent = method in ("GET", "HEAD")
+        hedge_delay = None
+        if self.hedge_requests and idempotent and not stream:
+            hedge_delay = self.hedge_delay()
+
+        for attempt in range(self.max_retries + 1):
+            connection = self.get_connection()
+
+            attempt_timeout = timeout
+            remaining = remaining_time()
+            if remaining is not None:
+                if remaining <= 0:
+                    raise ConnectionTimeout(
+                        "TIMEOUT", "No time left to send the request", None
+                    )
+                attempt_timeout = min(timeout or connection.timeout, remaining)
+
+            started_at = time.perf_counter()
+            try:
+                request = (method, url, params, body)
+                options = dict(
+                    headers=headers,
+                    ignore=ignore,
+                    timeout=attempt_timeout,
+                    stream=stream,
+                )
+                if hedge_delay is not None:
+                    connection, response = self._hedged_request(
+                        connection, hedge_delay, *request, **options
+                    )
+                else:
+                    response = connection.perform_request(*request, **options)
+                status, headers_response, data = response
+
+            except TransportError as e:
+                retry = False
+                if isinstance(e, ConnectionTimeout):
+                    retry = self.retry_on_timeout or idempotent
+                elif isinstance(e, ConnectionError):
+                    retry = True
+                elif e.status_code in self.retry_on_status:
+                    retry = True
+
+                if retry:
+                    try:
+                        # only mark as dead if we are retrying
+                        self.mark_dead(connection)
+                    except TransportError:
+                        # If sniffing on failure, it could fail too. Catch the
+                        # exception not to interrupt the retries.
+                        pass
+                    # raise exception on last retry
+                    if attempt == self.max_retries:
+                        raise e
+                    delay = self.backoff(attempt)
+                    remaining = remaining_time()
+                    if remaining is not None and remaining <= delay:
+                        self.log.debug("No time left to retry")
+                        raise e
+                    if not self._take_retry():
+                        self.log.debug("Retry budget exhausted")
+                        raise e
+                    time.sleep(delay)
+                else:
+                    raise e
+
+            else:
+                # connection didn't fail, confirm it's live status
+                self.connection_pool.mark_live(connection)
+
+                return status, headers_response, data
+
+            finally:
+                self._timing.total = self.request_time + (
+                    time.perf_counter() - started_at
+                )
+
+    def _perform_request(self, method, url, headers, params, body):
+        method, params, body, ignore, timeout = self._resolve_request_args(
+            method, params, body
+        )
+
+        try:
+            status, headers_response, data = self._send(
+                method, url, headers, params, body, ignore, timeout, False
+            )
+        except TransportError as e:
+            if method == "HEAD" and e.status_code == 404:
+                return False
+            raise
+
+        if method == "HEAD":
+            return 200 <= status < 300
+
+        if data:
+            with trace.phase("deserialize", request=True):
+                data = self.deserializer.loads(
+                    data, headers_response.get("content-type")
+                )
+        return data
+
+    def stream_request(
+        self, method, url, headers=None, params=None, body=None
+    ):
+        """Iterate over the elements of the JSON array returned by a request.
+
+        Elements are decoded while the response is downloaded, so only one of
+        them is held in memory at a time. Failures are only retried until the
+        response starts coming in.
+        """
+        if (
+            self.response_cache is not None
+            and method == "GET"
+            and self.response_cache.ttl(url)
+        ):
+            return iter(
+                self.perform_request(
+                    method, url, headers=headers, params=params, body=body
+                )
+            )
+
+        method, params, body, ignore, timeout = self._resolve_request_args(
+            method, params, body
+        )
+        status, headers_response, chunks = self._send(
+            method, url, headers, params, body, ignore, timeout, True
+        )
+
+        return iter_json_array(chunks)
+
+    def perform_request(
+        self, method, url, headers=None, params=None, body=None
+    ):
+        if self.response_cache is None:
+            return self._perform_request(method, url, headers, params, body)
+
+        if self.response_cache.changes_state(method, url):
+            # Whatever was cached may not reflect the cluster anymore
+            self.response_cache.invalidate()
+
+        ttl = self.response_cache.ttl(url) if method == "GET" else 0
+        if ttl:
+            key = self.response_cache.key(method, url, params, body)
+            response = self.response_cache.get(key, ttl)
+            if response is not None:
+                return response
+
+        response = self._perform_request(method, url, headers, params, body)
+
+        if ttl:
+            self.response_cache.set(key, response)
+
+        return response
@@ -1,11 +1,13 @@
+import codecs
+import hashlib
+import json
 import logging
+import marshal
 import os
-import yaml
+import re
 import sys
 from pathlib import Path
 
-import cerberus
-
 
 class Color:
     PURPLE = "\033[95m"
@@ -17,6 +19,7 @@ class Color:
     RED = "\033[91m"
     BOLD = "\033[1m"
     UNDERLINE = "\033[4m"
+    REVERSE = "\033[7m"
     END = "\033[0m"
 
 
@@ -55,8 +58,15 @@ class JSONFormatter:
 
         return tuple(valid_list)
 
+    def _iter_rows(self, keys):
+        for obj in self.json:
+            yield tuple([obj.get(key) for key in keys])
+
     def to_lister(self, columns=[]):
+        """Return the headers and the rows of a Lister.
 
+        Rows are built lazily, one at a time, while the output is rendered.
+        """
         columns = self._ensure_params_format(columns)
 
         headers = []
@@ -64,14 +74,7 @@ class JSONFormatter:
             headers.append(element[1])
         headers = tuple(headers)
 
-        lst = []
-        for obj in self.json:
-            row = []
-            for element in columns:
-                row.append(obj.get(element[0]))
-            lst.append(tuple(row))
-
-        return (headers, tuple(lst))
+        return (headers, self._iter_rows([element[0] for element in columns]))
 
     def to_show_one(self, lines=[]):
         lines = self._ensure_params_format(lines)
@@ -99,13 +102,19 @@ class Context:
 
 
 class ConfigFileParser:
-    """docstring for ConfigFileParser."""
+    """Load `~/.esctlrc`.
+
+    The parsed and validated document is saved in the cache directory, and
+    reused as long as the file keeps the same modification time, size and
+    content hash, so YAML parsing and validation only happen once per change.
+    """
 
     log = logging.getLogger(__name__)
 
     def __init__(self):
         super(ConfigFileParser, self).__init__()
         self.path = os.path.expanduser("~") + "/.esctlrc"
+        self._contexts = {}
         self.log.debug("Trying to load config file : {}".format(self.path))
 
     def _create_default_config_file(self):
@@ -122,10 +131,14 @@ class ConfigFileParser:
             "default-context": "localhost",
         }
 
+        import yaml
+
         with open(self.path, "w") as config_file:
             yaml.dump(default_config, config_file, default_flow_style=False)
 
     def _ensure_config_file_is_valid(self, document):
+        import cerberus
+
         schema = {
             "settings": {"type": "dict"},
             "clusters": {"type": "dict"},
@@ -160,19 +173,22 @@ class ConfigFileParser:
         if not Path(self.path).is_file():
             self._create_default_config_file()
 
-        with open(self.path, "r") as config_file:
-            try:
-                self.raw = yaml.safe_load(config_file)
-            except yaml.YAMLError as err:
-                self.log.critical("Cannot read YAML from {}".format(self.path))
-                self.log.critical(str(err.problem) + str(err.problem_mark))
-                sys.exit(1)
+        with open(self.path, "rb") as config_file:
+            content = config_file.read()
+            stat = os.fstat(config_file.fileno())
+        key = [
+            self.path,
+            stat.st_mtime_ns,
+            stat.st_size,
+            hashlib.sha1(content).hexdigest(),
+        ]
 
-        try:
-            self._ensure_config_file_is_valid(self.raw)
-        except SyntaxError as err:
-            sys.exit(1)
+        self.raw = self._load_snapshot(key)
+        if self.raw is None:
+            self.raw = self._parse(content)
+            self._save_snapshot(key, self.raw)
 
+        self._contexts = {}
         for config_block in config_blocks:
             if not hasattr(self, config_block):
                 setattr(self, config_block, None)
@@ -181,6 +197,56 @@ class ConfigFileParser:
                 "{}: {}".format(config_block, getattr(self, config_block))
             )
 
+    def _parse(self, content):
+        import yaml
+
+        try:
+            document = yaml.safe_load(content)
+        except yaml.YAMLError as err:
+            self.log.critical("Cannot read YAML from {}".format(self.path))
+            self.log.critical(str(err.problem) + str(err.problem_mark))
+            sys.exit(1)
+
+        try:
+            self._ensure_config_file_is_valid(document)
+        except SyntaxError as err:
+            sys.exit(1)
+
+        return document
+
+    @property
+    def snapshot_path(self):
+        return os.path.join(cache_directory(), "esctlrc.marshal")
+
+    def _load_snapshot(self, key):
+        try:
+            with open(self.snapshot_path, "rb") as snapshot_file:
+                snapshot = marshal.load(snapshot_file)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+
+        if not isinstance(snapshot, dict) or snapshot.get("key") != key:
+            return None
+
+        self.log.debug("Using compiled configuration")
+        return snapshot.get("document")
+
+    def _save_snapshot(self, key, document):
+        temporary_file = "{}.{}".format(self.snapshot_path, os.getpid())
+
+        try:
+            data = marshal.dumps({"key": key, "document": document})
+            # The configuration holds credentials
+            fd = os.open(
+                temporary_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600
+            )
+            with os.fdopen(fd, "wb") as snapshot_file:
+                snapshot_file.write(data)
+            os.replace(temporary_file, self.snapshot_path)
+        except (OSError, ValueError) as error:
+            # Values marshal cannot handle (like YAML dates) are only parsed
+            self.log.debug("Cannot compile configuration : {}".format(error))
+
     def load_config_block(self, key):
         if key in self.raw:
             setattr(self, key, self.raw.get(key))
@@ -188,6 +254,12 @@ class ConfigFileParser:
             self.log.debug("Cannot find config block : " + key)
 
     def get_context_informations(self, context_name):
+        if context_name not in self._contexts:
+            self._contexts[context_name] = self._resolve_context(context_name)
+
+        return self._contexts[context_name]
+
+    def _resolve_context(self, context_name):
         user = self.users.get(self.contexts.get(context_name).get("user"))
         cluster = self.clusters.get(
             self.contexts.get(context_name).get("cluster")
@@ -195,12 +267,14 @@ class ConfigFileParser:
 
         # Merge global settings and per-cluster settings.
         # Cluster-level settings override global settings
-        if 'settings' in cluster:
-            settings = {**self.settings, **cluster.get('settings')}
+        if "settings" in cluster:
+            settings = {**self.settings, **cluster.get("settings")}
         else:
             settings = {**self.settings}
 
-        return Context(context_name, user=user, cluster=cluster, settings=settings)
+        return Context(
+            context_name, user=user, cluster=cluster, settings=settings
+        )
 
 
 def print_success(message):
@@ -211,16 +285,215 @@ def print_output(message):
     print("{}".format(message))
 
 
-def flatten_dict(dictionary):
-    def expand(key, value):
-        if isinstance(value, dict):
-            return [(key + "." + k, v) for k, v in flatten_dict(value).items()]
+def iter_json_array(chunks):
+    """Iterate over the elements of a JSON array received as bytes chunks.
+
+    Each element is decoded as soon as it has been entirely received, so the
+    whole document is never held in memory.
+    """
+    decoder = json.JSONDecoder()
+    utf8_decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    buffer = ""
+    position = 0
+    in_array = False
+    exhausted = False
+
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+
+        if position < len(buffer):
+            if not in_array:
+                if buffer[position] != "[":
+                    raise ValueError("Expected a JSON array")
+                in_array = True
+                position += 1
+                continue
+
+            if buffer[position] == "]":
+                return
+
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if exhausted:
+                    raise
+            else:
+                # A number at the end of the buffer may not be complete yet
+                if (
+                    end < len(buffer)
+                    or exhausted
+                    or isinstance(element, (dict, list, str))
+                ):
+                    yield element
+                    position = end
+                    continue
+        elif exhausted:
+            raise ValueError("Unexpected end of JSON array")
+
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            exhausted = True
+            chunk = b""
+
+        buffer = buffer[position:] + utf8_decoder.decode(chunk, exhausted)
+        position = 0
+
+
+def _glob_to_regex(glob, trailing=True):
+    # `*` stays within a key part, unless it ends the glob or is doubled.
+    # Each part may be followed by the positions of expanded lists, so
+    # `a.b.c` matches `a.b[0].c` too
+    parts = []
+    for part in glob.split("."):
+        regex = ""
+        for token in re.split(r"(\*\*|\*|\?)", part):
+            if token == "**":
+                regex += ".*"
+            elif token == "*":
+                regex += "[^.]*"
+            elif token == "?":
+                regex += "[^.]"
+            else:
+                regex += re.escape(token)
+        parts.append(regex + r"(?:\[\d+\])*")
+
+    regex = r"\.".join(parts)
+    if trailing and glob.endswith("*"):
+        regex += ".*"
+    return regex
+
+
+def _compile_globs(globs, parents=False):
+    """Return a regex matching the keys matched by one of `globs`.
+
+    With `parents`, it matches the keys of the objects holding them too.
+    """
+    regexes = []
+    for glob in globs:
+        if parents:
+            parts = glob.split(".")
+            for length in range(1, len(parts) + 1):
+                parent = ".".join(parts[:length])
+                if length < len(parts):
+                    regexes.append(_glob_to_regex(parent, trailing=False))
+                # The list holding `a.b[0]` is keyed `a.b`
+                listed = re.sub(r"(?:\[\d+\])+\Z", "", parent)
+                if listed != parent:
+                    regexes.append(_glob_to_regex(listed, trailing=False))
+        regexes.append(_glob_to_regex(glob))
+
+    return re.compile("(?:{})\\Z".format("|".join(regexes)))
+
+
+def flatten_dict(dictionary, include=None, exclude=None, expand_lists=False):
+    """Return the leaves of the nested `dictionary`, keyed like `a.b.c`.
+
+    With `expand_lists`, lists of objects are flattened too, their elements
+    being keyed like `a.b[0].c`. `include` and `exclude` are globs the keys
+    must, or must not, match : `*` matches within a part of the key, `**`
+    across parts, and a trailing `*` anything below (like `nodes.jvm.*`).
+    They go through lists, `nodes.jvm.versions.*` matching the keys of
+    every element, unless a position is given like `nodes.jvm.versions[0]`.
+    Objects which cannot hold any included key are not walked at all.
+    """
+    included = parents = excluded = None
+    if include:
+        included = _compile_globs(include)
+        parents = _compile_globs(include, parents=True)
+    if exclude:
+        excluded = _compile_globs(exclude)
+
+    flat = {}
+    # Walked depth first, with a stack rather than recursive calls, so each
+    # key is built once and no intermediate dictionary is allocated
+    stack = [("", iter(dictionary.items()))]
+    while stack:
+        path, items = stack[-1]
+        for key, value in items:
+            key = path + key
+
+            container = isinstance(value, dict) or (
+                expand_lists
+                and isinstance(value, list)
+                and any(isinstance(element, dict) for element in value)
+            )
+            if container:
+                if excluded is not None and excluded.match(key):
+                    continue
+                if parents is not None and not parents.match(key):
+                    continue
+
+                if isinstance(value, dict):
+                    stack.append((key + ".", iter(value.items())))
+                else:
+                    stack.append(
+                        (
+                            key,
+                            (
+                                ("[{}]".format(position), element)
+                                for position, element in enumerate(value)
+                            ),
+                        )
+                    )
+                break
+
+            if included is not None and not included.match(key):
+                continue
+            if excluded is not None and excluded.match(key):
+                continue
+            flat[key] = value
         else:
-            return [(key, value)]
+            stack.pop()
+
+    return flat
+
+
+def gather(*calls, max_workers=None):
+    """Run `calls` concurrently and return their results, in order.
+
+    Each call runs in a thread, with a copy of the context of the caller, and
+    requests share the connections of the client. The first exception raised
+    by a call is raised again once all of them are done.
+    """
+    import contextvars
+    from concurrent.futures import ThreadPoolExecutor
+
+    if not calls:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(calls)) as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, call)
+            for call in calls
+        ]
+
+    return [future.result() for future in futures]
+
+
+def format_bytes(size):
+    """Format a number of bytes the way the `_cat` APIs do (like `1.2gb`)."""
+    for unit in ("b", "kb", "mb", "gb", "tb"):
+        if abs(size) < 1024:
+            break
+        size /= 1024.0
+    else:
+        unit = "pb"
+
+    return "{:.1f}{}".format(size, unit) if unit != "b" else "{}b".format(size)
+
 
-    items = [item for k, v in dictionary.items() for item in expand(k, v)]
+def cache_directory():
+    """Return the directory where esctl keeps its cached state."""
+    path = os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+        "esctl",
+    )
+    os.makedirs(path, exist_ok=True)
 
-    return dict(items)
+    return path
 
 
 def colorize(str, color):
@@ -0,0 +1,96 @@
+import time
+
+from esctl.utils import Color, colorize
+
+
+def highlight_changes(previous_rows, rows, key_indexes=(0,)):
+    """Highlight the cells of `rows` which changed since `previous_rows`.
+
+    Rows are matched on their cells at `key_indexes`. Numeric cells also show
+    by how much they changed.
+    """
+
+    def key(row):
+        return tuple([row[index] for index in key_indexes])
+
+    previous_rows = dict((key(row), row) for row in previous_rows)
+
+    for row in rows:
+        previous_row = previous_rows.get(key(row))
+
+        if previous_row is None or previous_row == row:
+            yield row
+            continue
+
+        yield tuple(
+            [
+                _highlight(old, new) if old != new else new
+                for old, new in zip(previous_row, row)
+            ]
+        )
+
+
+def _highlight(old, new):
+    try:
+        delta = float(new) - float(old)
+    except (TypeError, ValueError):
+        return colorize(new, Color.REVERSE)
+
+    return colorize("{} ({:+g})".format(new, delta), Color.REVERSE)
+
+
+class WatchScreen:
+    """Redraw a periodically refreshed output in place.
+
+    Only the lines which differ from the previous drawing are rewritten, using
+    ANSI cursor movements. When the output is not a terminal, every drawing is
+    simply appended.
+    """
+
+    def __init__(self, stream, title):
+        super(WatchScreen, self).__init__()
+        self.stream = stream
+        self.title = title
+        self.lines = None
+        self.interactive = hasattr(stream, "isatty") and stream.isatty()
+
+    def draw(self, text):
+        lines = ["{}    {}".format(self.title, time.strftime("%c"))]
+        lines.extend(text.rstrip("\n").split("\n"))
+
+        if not self.interactive:
+            self.stream.write("\n".join(lines) + "\n\n")
+        elif self.lines is None:
+            # Clear the screen on the first drawing
+            self.stream.write("\033[H\033[2J" + "\n".join(lines) + "\n")
+        else:
+            for number, line in enumerate(lines):
+                if number >= len(self.lines) or self.lines[number] != line:
+                    self.stream.write(
+                        "\033[{};1H{}\033[K".format(number + 1, line)
+                    )
+            # Erase what is left of a longer previous drawing
+            self.stream.write("\033[{};1H\033[J".format(len(lines) + 1))
+
+        self.stream.flush()
+        self.lines = lines
+
+
+def every(interval):
+    """Yield forever, every `interval` seconds.
+
+    Ticks are scheduled from the start time rather than from the end of the
+    previous iteration so they do not drift. When an iteration takes longer
+    than `interval`, the missed ticks are skipped instead of piling up.
+    """
+    next_tick = time.monotonic()
+
+    while True:
+        yield
+
+        next_tick += interval
+        now = time.monotonic()
+        if next_tick < now:
+            next_tick += ((now - next_tick) // interval + 1) * interval
+
+        time.sleep(next_tick - now)
@@ -3,7 +3,17 @@
 from setuptools import setup, find_packages
 
 PROJECT = "esctl"
-VERSION = "1.0"
+
+
+def read_module(path):
+    namespace = {}
+    with open(path) as module:
+        exec(module.read(), namespace)
+    return namespace
+
+
+VERSION = read_module("esctl/__init__.py")["__version__"]
+COMMANDS = read_module("esctl/commands.py")["COMMANDS"]
 
 try:
     long_description = open("README.rst", "rt").read()
@@ -44,28 +54,19 @@ setup(
     scripts=[],
     provides=[],
     install_requires=requirements,
+    extras_require={"msgpack": ["msgpack"]},
     namespace_packages=[],
     packages=find_packages(),
     include_package_data=True,
     entry_points={
-        "console_scripts": ["esctl = esctl.main:main"],
+        "console_scripts": ["esctl = esctl.startup:main"],
         "esctl": [
-            "cat allocation = esctl.cmd.cat:CatAllocation",
-            "cluster allocation explain = esctl.cmd.cluster:ClusterAllocationExplain",
-            "cluster health = esctl.cmd.cluster:ClusterHealth",
-            "cluster routing allocation enable = esctl.cmd.cluster:ClusterRoutingAllocationEnable",
-            "cluster stats = esctl.cmd.cluster:ClusterStats",
-            "config context list = esctl.cmd.config:ConfigContextList",
-            "index close = esctl.cmd.index:IndexClose",
-            "index create = esctl.cmd.index:IndexCreate",
-            "index delete = esctl.cmd.index:IndexDelete",
-            "index list = esctl.cmd.index:IndexList",
-            "index open = esctl.cmd.index:IndexOpen",
-            "logging get = esctl.cmd.logging:LoggingGet",
-            "logging reset = esctl.cmd.logging:LoggingReset",
-            "logging set = esctl.cmd.logging:LoggingSet",
-            "node hot-threads = esctl.cmd.node:NodeHotThreads",
-            "node list = esctl.cmd.node:NodeList",
+            "{} = {}".format(name, target)
+            for name, target in sorted(COMMANDS.items())
+        ],
+        "cliff.formatter.list": [
+            "ndjson = esctl.formatters:NDJSONFormatter",
+            "msgpack = esctl.formatters:MsgpackFormatter",
         ],
     },
     zip_safe=False,
@@ -0,0 +1,91 @@
+import unittest
+
+from esctl.aggregate import ColumnTable
+
+
+class TestColumnTable(unittest.TestCase):
+    def setUp(self):
+        self.table = ColumnTable(
+            text_columns=("index", "node"), numeric_columns=("store",)
+        ).extend(
+            [
+                {"index": "a", "node": "node1", "store": "10"},
+                {"index": "a", "node": "node2", "store": "30"},
+                {"index": "b", "node": "node1", "store": "20"},
+                {"index": "b", "node": None, "store": None},
+            ]
+        )
+
+    def test_dictionary_encoded(self):
+        self.assertEqual(self.table.size, 4)
+        self.assertEqual(self.table.values["index"], ["a", "b"])
+        self.assertEqual(list(self.table.codes["index"]), [0, 0, 1, 1])
+        self.assertEqual(
+            self.table.row(3), {"index": "b", "node": None, "store": 0}
+        )
+
+    def test_group_by(self):
+        self.assertEqual(
+            self.table.group_by("node", sums=("store",)),
+            [
+                {"node": "node1", "count": 2, "store": 30},
+                {"node": "node2", "count": 1, "store": 30},
+                {"node": None, "count": 1, "store": 0},
+            ],
+        )
+
+    def test_top(self):
+        self.assertEqual(
+            [row["store"] for row in self.table.top("store", 2)], [30, 20]
+        )
+
+    def test_percentiles(self):
+        self.assertEqual(
+            self.table.percentiles("store", (0, 50, 100)), [10, 20, 30]
+        )
+
+    def test_outliers(self):
+        table = ColumnTable(numeric_columns=("heap",)).extend(
+            {"heap": heap} for heap in (40, 42, 45, 41, 95, 43)
+        )
+
+        self.assertEqual(table.outliers("heap"), [4])
+
+    def test_missing_values_skipped(self):
+        table = ColumnTable(numeric_columns=("heap",)).extend(
+            {"heap": heap} for heap in (40, None, None, None, 42, None, 45)
+        )
+
+        self.assertEqual(table.missing["heap"], {1, 2, 3, 5})
+        self.assertEqual(table.percentiles("heap", (0, 100)), [40, 45])
+        self.assertEqual(table.outliers("heap"), [])
+
+    def test_rates(self):
+        before = ColumnTable(
+            text_columns=("node",), numeric_columns=("timestamp", "total")
+        ).extend(
+            [
+                {"node": "a", "timestamp": 1000, "total": 100},
+                {"node": "b", "timestamp": 1000, "total": 500},
+            ]
+        )
+        after = ColumnTable(
+            text_columns=("node",), numeric_columns=("timestamp", "total")
+        ).extend(
+            [
+                {"node": "b", "timestamp": 3000, "total": 20},
+                {"node": "a", "timestamp": 5000, "total": 300},
+                {"node": "c", "timestamp": 5000, "total": 1},
+            ]
+        )
+
+        self.assertEqual(
+            after.rates(before, "node", ("total",), elapsed=1),
+            [{"node": "b", "total": 20.0}, {"node": "a", "total": 200.0}],
+        )
+        self.assertEqual(
+            after.rates(
+                before, "node", ("total",), elapsed=1, timestamps="timestamp"
+            ),
+            [{"node": "b", "total": 10.0}, {"node": "a", "total": 50.0}],
+        )
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from esctl.cache import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.patcher = patch.dict(
+            os.environ, {"XDG_CACHE_HOME": self.directory.name}
+        )
+        self.patcher.start()
+        self.cache = ResponseCache(
+            "test", ttls={"_cat/*": 30, "_cat/indices": 10}
+        )
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.directory.cleanup()
+
+    def test_ttl(self):
+        self.assertEqual(self.cache.ttl("/_cat/indices"), 10)
+        self.assertEqual(self.cache.ttl("/_cat/nodes"), 30)
+        self.assertEqual(self.cache.ttl("/_cluster/health"), 0)
+
+    def test_max_age_overrides_ttl(self):
+        self.cache.max_age = 5
+
+        self.assertEqual(self.cache.ttl("/_cluster/health"), 5)
+
+    def test_key_ignores_transport_params(self):
+        self.assertEqual(
+            self.cache.key("GET", "/_cat/nodes", {"format": "json"}, None),
+            self.cache.key(
+                "GET",
+                "/_cat/nodes",
+                {"format": "json", "request_timeout": 3},
+                None,
+            ),
+        )
+
+    def test_changes_state(self):
+        self.assertFalse(self.cache.changes_state("GET", "/_cat/nodes"))
+        self.assertFalse(self.cache.changes_state("POST", "/logs-*/_search"))
+        self.assertFalse(
+            self.cache.changes_state("POST", "/_cluster/allocation/explain")
+        )
+        self.assertFalse(self.cache.changes_state("POST", "/_count"))
+        self.assertTrue(self.cache.changes_state("POST", "/logs/_close"))
+        self.assertTrue(self.cache.changes_state("POST", "/_bulk"))
+        self.assertTrue(self.cache.changes_state("PUT", "/logs"))
+        self.assertTrue(self.cache.changes_state("DELETE", "/logs"))
+
+    def test_get_set(self):
+        key = self.cache.key("GET", "/_cat/nodes", None, None)
+        self.cache.set(key, [{"name": "node1"}])
+
+        self.assertEqual(self.cache.get(key, 30), [{"name": "node1"}])
+        self.assertIsNone(self.cache.get(key, -1))
+
+        self.cache.invalidate()
+        self.assertIsNone(self.cache.get(key, 30))
+
+    def test_evict_least_recently_used(self):
+        self.cache.max_size = 100
+        for index in range(10):
+            self.cache.set(str(index), "x" * 40)
+            os.utime(os.path.join(self.cache.path, str(index)), (index, index))
+
+        self.cache.evict()
+
+        self.assertEqual(sorted(os.listdir(self.cache.path)), ["9"])
+
+    def test_evict_removed_entries(self):
+        self.cache.set("a", "x")
+
+        # Another thread or process removed the entries meanwhile
+        with patch("os.DirEntry.stat", side_effect=FileNotFoundError):
+            self.cache.evict()
+        self.cache.invalidate()
+        self.cache.evict()
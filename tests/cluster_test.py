@@ -1,4 +1,7 @@
+from unittest.mock import patch
+
 import esctl.cmd.cluster
+from esctl.style import style_rows
 from base_test_class import EsctlTestCase
 
 
@@ -28,13 +31,159 @@ class TestClusterHealth(EsctlTestCase):
         }
 
     def test_health_status_color(self):
-        self.assertEqual(
-            self.cluster_health.colorize_cluster_status("green")[0], "\x1b[92m"
+        self.MockClass._es.cluster.health.return_value = self.fixture()
+        column_names, data = self.cluster_health.take_action(None)
+        rows = list(style_rows(column_names, data, self.cluster_health.styles))
+
+        self.assertIn(("status", "green"), data)
+        self.assertIn(["status", "\x1b[92mgreen\x1b[0m"], rows)
+        self.assertIn(("number_of_nodes", 92), rows)
+
+
+class TestClusterAllocationExplain(EsctlTestCase):
+    def setUp(self):
+        super()._setUp()
+        self.MockClass._es.transport.stream_request.return_value = iter(
+            self.fixture()
         )
-        self.assertEqual(
-            self.cluster_health.colorize_cluster_status("yellow")[0],
-            "\x1b[93m",
+        self.explain = esctl.cmd.cluster.ClusterAllocationExplain(self.app, {})
+        self.parser = self.explain.get_parser(
+            "esctl cluster allocation explain"
+        )
+
+    def fixture(self):
+        return [
+            {"index": "a", "shard": "0", "prirep": "p", "state": "STARTED"},
+            {"index": "a", "shard": "0", "prirep": "r", "state": "UNASSIGNED"},
+            {"index": "b", "shard": "1", "prirep": "r", "state": "UNASSIGNED"},
+            {"index": "c", "shard": "0", "prirep": "p", "state": "UNASSIGNED"},
+        ]
+
+    def explanation(self, reason, *deciders):
+        return {
+            "unassigned_info": {"reason": reason},
+            "node_allocation_decisions": [
+                {
+                    "deciders": [
+                        {"decider": decider, "explanation": decider + " no"}
+                        for decider in deciders
+                    ]
+                }
+                for node in range(3)
+            ],
+        }
+
+    def test_unassigned_shards_grouped(self):
+        explanations = {
+            "a": self.explanation("NODE_LEFT", "same_shard"),
+            "b": self.explanation("NODE_LEFT", "same_shard"),
+            "c": self.explanation("ALLOCATION_FAILED", "disk_threshold"),
+        }
+        self.MockClass._es.cluster.allocation_explain.side_effect = (
+            lambda body, **kwargs: explanations[body["index"]]
+        )
+
+        column_names, data = self.explain.take_action(
+            self.parser.parse_args(["--unassigned"])
         )
+
         self.assertEqual(
-            self.cluster_health.colorize_cluster_status("red")[0], "\x1b[91m"
+            list(data),
+            [
+                (
+                    "NODE_LEFT",
+                    "same_shard",
+                    2,
+                    "a[0]r b[1]r",
+                    "same_shard no",
+                ),
+                (
+                    "ALLOCATION_FAILED",
+                    "disk_threshold",
+                    1,
+                    "c[0]p",
+                    "disk_threshold no",
+                ),
+            ],
+        )
+        self.MockClass._es.cluster.allocation_explain.assert_any_call(
+            body={"index": "c", "shard": 0, "primary": True},
+            filter_path=",".join(self.explain.filter_path),
+        )
+
+    def test_patterns_without_unassigned(self):
+        explanation = self.explanation("NODE_LEFT", "same_shard")
+        explanation["unassigned_info"]["last_allocation_status"] = "no"
+        self.MockClass._es.cluster.allocation_explain.return_value = (
+            explanation
+        )
+
+        self.explain.take_action(self.parser.parse_args(["a"]))
+
+        self.MockClass._es.cluster.allocation_explain.assert_called_once_with(
+            body={"index": "a", "shard": 0, "primary": False}
+        )
+
+
+class TestClusterOverview(EsctlTestCase):
+    def setUp(self):
+        super()._setUp()
+        # The commands the overview runs use the same client
+        for module in ("cat", "index", "node"):
+            patcher = patch(
+                "esctl.cmd.{}.Esctl".format(module), self.MockClass
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(self.patcher.stop)
+
+        es = self.MockClass._es
+        es.cluster.health.return_value = {
+            "cluster_name": "test",
+            "status": "red",
+            "number_of_nodes": 3,
+            "number_of_data_nodes": 2,
+            "active_shards": 10,
+            "active_shards_percent_as_number": 90.0,
+            "relocating_shards": 1,
+            "initializing_shards": 0,
+            "unassigned_shards": 2,
+        }
+        es.cluster.pending_tasks.return_value = {
+            "tasks": [
+                {"time_in_queue_millis": 10, "time_in_queue": "10ms"},
+                {"time_in_queue_millis": 2000, "time_in_queue": "2s"},
+            ]
+        }
+        es.cat.nodes.return_value = [
+            {"name": "node-1", "heap.percent": "20"},
+            {"name": "node-2", "heap.percent": "70"},
+        ]
+        es.cat.allocation.return_value = [
+            {"node": "UNASSIGNED", "disk.percent": None},
+            {"node": "node-2", "disk.percent": "40"},
+        ]
+        es.transport.stream_request.side_effect = (
+            lambda method, path, params: (
+                [{"index": "a"}] if params["health"] == "red" else []
+            )
+        )
+        self.overview = esctl.cmd.cluster.ClusterOverview(self.app, {})
+
+    def test_overview(self):
+        column_names, data = self.overview.take_action(
+            self.overview.get_parser("esctl cluster overview").parse_args([])
+        )
+        overview = dict(data)
+
+        self.assertEqual(overview["nodes"], "3 (2 data)")
+        self.assertEqual(overview["relocating shards"], 1)
+        self.assertEqual(overview["pending tasks"], 2)
+        self.assertEqual(overview["oldest pending task"], "2s")
+        self.assertEqual(overview["max heap"], "node-2 (70%)")
+        self.assertEqual(overview["max disk"], "node-2 (40%)")
+        self.assertEqual(overview["red indices"], "1 (a)")
+        self.assertEqual(overview["yellow indices"], 0)
+        self.MockClass._es.cat.nodes.assert_called_once_with(
+            format="json", h="name,heap.percent", s="heap.percent"
         )
@@ -0,0 +1,29 @@
+import unittest
+
+from cliff.command import Command
+
+from esctl.commands import COMMANDS
+from esctl.override import EsctlCommandManager
+
+
+class TestEsctlCommandManager(unittest.TestCase):
+    def setUp(self):
+        self.command_manager = EsctlCommandManager("esctl")
+
+    def test_indexed_commands_are_importable(self):
+        for name in COMMANDS:
+            command_class = self.command_manager.commands[name].load()
+            self.assertTrue(issubclass(command_class, Command), name)
+
+    def test_find_command(self):
+        cmd_factory, cmd_name, sub_argv = self.command_manager.find_command(
+            ["index", "list", "--help"]
+        )
+
+        self.assertEqual(cmd_factory.__name__, "IndexList")
+        self.assertEqual(cmd_name, "index list")
+        self.assertEqual(sub_argv, ["--help"])
+
+    def test_unknown_command(self):
+        with self.assertRaises(ValueError):
+            self.command_manager.find_command(["does", "not", "exist"])
@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from esctl.utils import ConfigFileParser
+
+CONFIG = """
+settings: {timeout: 10}
+clusters:
+  foo: {servers: ["http://localhost:9200"], settings: {timeout: 20}}
+users:
+  john: {username: john, password: doe}
+contexts:
+  foo: {cluster: foo, user: john}
+default-context: foo
+"""
+
+
+class TestConfigFileParser(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.patcher = patch.dict(
+            os.environ, {"XDG_CACHE_HOME": self.directory.name}
+        )
+        self.patcher.start()
+        self.parser = ConfigFileParser()
+        self.parser.path = os.path.join(self.directory.name, "esctlrc")
+        self.write(CONFIG)
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.directory.cleanup()
+
+    def write(self, content):
+        with open(self.parser.path, "w") as config_file:
+            config_file.write(content)
+
+    def test_context(self):
+        self.parser.load_configuration()
+        context = self.parser.get_context_informations("foo")
+
+        self.assertEqual(context.user.get("username"), "john")
+        self.assertEqual(context.settings.get("timeout"), 20)
+
+    def test_compiled_configuration_reused(self):
+        self.parser.load_configuration()
+
+        with patch.object(self.parser, "_parse") as parse:
+            self.parser.load_configuration()
+
+        parse.assert_not_called()
+        self.assertEqual(self.parser.raw.get("default-context"), "foo")
+        self.assertEqual(
+            os.stat(self.parser.snapshot_path).st_mode & 0o777, 0o600
+        )
+
+    def test_modified_configuration_parsed(self):
+        self.parser.load_configuration()
+        self.write(
+            CONFIG.replace("default-context: foo", "default-context: bar")
+        )
+        self.parser.load_configuration()
+
+        self.assertEqual(self.parser.raw.get("default-context"), "bar")
@@ -0,0 +1,142 @@
+"""Compare `flatten_dict` with the former recursive implementation.
+
+The payload has the shape of `_nodes/stats` for a few hundred nodes, built
+from the stats of a single node. Run it with `python tests/flatten_benchmark.py`.
+"""
+
+import copy
+import timeit
+
+from esctl.utils import flatten_dict
+
+NODE_STATS = {
+    "name": "node",
+    "host": "10.0.0.1",
+    "roles": ["data", "ingest", "master"],
+    "indices": {
+        "docs": {"count": 19562431, "deleted": 1203},
+        "store": {"size_in_bytes": 87163462323},
+        "indexing": {
+            "index_total": 9817319,
+            "index_time_in_millis": 4232341,
+            "index_current": 0,
+            "index_failed": 2,
+            "delete_total": 1231,
+            "throttle_time_in_millis": 0,
+        },
+        "search": {
+            "open_contexts": 0,
+            "query_total": 123123,
+            "query_time_in_millis": 2348834,
+            "fetch_total": 23423,
+            "fetch_time_in_millis": 12312,
+            "scroll_total": 12,
+        },
+        "merges": {"current": 0, "total": 1231, "total_time_in_millis": 2334},
+        "segments": {"count": 1231, "memory_in_bytes": 123123123},
+    },
+    "os": {
+        "cpu": {"percent": 12, "load_average": {"1m": 1.2, "5m": 1.1}},
+        "mem": {"total_in_bytes": 67271327744, "used_percent": 98},
+    },
+    "jvm": {
+        "mem": {
+            "heap_used_in_bytes": 12323123123,
+            "heap_used_percent": 45,
+            "pools": dict(
+                (pool, {"used_in_bytes": 123123, "max_in_bytes": 1231231})
+                for pool in ("young", "survivor", "old")
+            ),
+        },
+        "gc": {
+            "collectors": {
+                "young": {
+                    "collection_count": 1231,
+                    "collection_time_in_millis": 123,
+                },
+                "old": {
+                    "collection_count": 2,
+                    "collection_time_in_millis": 12,
+                },
+            }
+        },
+    },
+    "thread_pool": dict(
+        (
+            pool,
+            {
+                "threads": 8,
+                "queue": 0,
+                "active": 0,
+                "rejected": 0,
+                "largest": 8,
+                "completed": 12312,
+            },
+        )
+        for pool in (
+            "analyze",
+            "fetch_shard_started",
+            "flush",
+            "generic",
+            "get",
+            "listener",
+            "management",
+            "refresh",
+            "search",
+            "snapshot",
+            "warmer",
+            "write",
+        )
+    ),
+    "fs": {
+        "data": [
+            {
+                "path": "/var/lib/elasticsearch/nodes/0",
+                "total_in_bytes": 1023123123123,
+                "free_in_bytes": 623123123123,
+            }
+        ]
+    },
+}
+
+
+def recursive_flatten_dict(dictionary):
+    def expand(key, value):
+        if isinstance(value, dict):
+            return [
+                (key + "." + k, v)
+                for k, v in recursive_flatten_dict(value).items()
+            ]
+        else:
+            return [(key, value)]
+
+    items = [item for k, v in dictionary.items() for item in expand(k, v)]
+
+    return dict(items)
+
+
+def main(nodes=300, repeat=5):
+    payload = {
+        "nodes": dict(
+            ("node-{}".format(node), copy.deepcopy(NODE_STATS))
+            for node in range(nodes)
+        )
+    }
+
+    assert flatten_dict(payload) == recursive_flatten_dict(payload)
+
+    cases = [
+        ("recursive", lambda: recursive_flatten_dict(payload)),
+        ("flatten_dict", lambda: flatten_dict(payload)),
+        (
+            "flatten_dict, jvm.* only",
+            lambda: flatten_dict(payload, include=["nodes.*.jvm.*"]),
+        ),
+    ]
+    for name, function in cases:
+        best = min(timeit.repeat(function, number=1, repeat=repeat))
+        print("{:<28} {:8.1f} ms".format(name, best * 1000))
+
+
+if __name__ == "__main__":
+    main()
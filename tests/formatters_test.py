@@ -0,0 +1,69 @@
+import io
+import json
+import unittest
+
+import esctl.main
+from esctl.cmd.node import NodeList
+from esctl.formatters import MsgpackFormatter, NDJSONFormatter
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class TestNDJSONFormatter(unittest.TestCase):
+    def test_one_object_per_row(self):
+        stdout = io.StringIO()
+        rows = iter([("node1", 45), ("node2", None)])
+
+        NDJSONFormatter().emit_list(("Name", "Heap %"), rows, stdout, None)
+
+        self.assertEqual(
+            [json.loads(line) for line in stdout.getvalue().splitlines()],
+            [
+                {"Name": "node1", "Heap %": 45},
+                {"Name": "node2", "Heap %": None},
+            ],
+        )
+
+
+@unittest.skipIf(msgpack is None, "msgpack is not installed")
+class TestMsgpackFormatter(unittest.TestCase):
+    def test_one_map_per_row(self):
+        stdout = io.TextIOWrapper(io.BytesIO())
+        rows = iter([("node1", 45), ("node2", None)])
+
+        MsgpackFormatter().emit_list(("Name", "Heap %"), rows, stdout, None)
+
+        self.assertEqual(
+            list(msgpack.Unpacker(io.BytesIO(stdout.buffer.getvalue()))),
+            [
+                {"Name": "node1", "Heap %": 45},
+                {"Name": "node2", "Heap %": None},
+            ],
+        )
+
+
+class FakeTerminal(io.StringIO):
+    def isatty(self):
+        return True
+
+
+class TestDefaultFormatter(unittest.TestCase):
+    def setUp(self):
+        self.app = esctl.main.Esctl()
+        self.command = NodeList(self.app, {})
+
+    def test_streaming_when_not_a_terminal(self):
+        self.app.stdout = io.StringIO()
+        self.assertEqual(self.command.default_formatter(), "csv")
+
+        self.app.stdout = FakeTerminal()
+        self.assertEqual(self.command.default_formatter(), "table")
+
+    def test_explicit_format(self):
+        parser = self.command.get_parser("esctl node list")
+
+        self.assertIsNone(parser.parse_args([]).formatter)
+        self.assertEqual(parser.parse_args(["-f", "json"]).formatter, "json")
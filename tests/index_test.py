@@ -0,0 +1,175 @@
+from unittest.mock import patch
+
+import elasticsearch
+
+import esctl.cmd.index
+from base_test_class import EsctlTestCase
+
+
+class TestIndexList(EsctlTestCase):
+    def setUp(self):
+        super()._setUp()
+        self.index_list = esctl.cmd.index.IndexList(self.app, {})
+        self.parser = self.index_list.get_parser("esctl index list")
+
+    def fixture(self):
+        return [{"index": "logs-1"}, {"index": "logs-2"}, {"index": "logs-3"}]
+
+    def test_batches(self):
+        self.assertEqual(self.index_list.batches([]), [None])
+        self.assertEqual(self.index_list.batches(["a*", "b*"]), ["a*,b*"])
+        self.assertEqual(
+            self.index_list.batches(["a*", "b*", "c*"], batch_size=2),
+            ["a*,b*", "c*"],
+        )
+
+    def test_conflicting_options(self):
+        for argv in (
+            ["--sort", "index", "--sort-column", "Index"],
+            ["--batch-size", "2"],
+        ):
+            with self.assertRaises(ValueError):
+                self.index_list.take_action(self.parser.parse_args(argv))
+
+    @patch("esctl.cmd.index.Esctl")
+    def test_filters_pushed_down(self, Esctl):
+        stream_request = Esctl._es.transport.stream_request
+        stream_request.return_value = iter(self.fixture())
+
+        column_names, data = self.index_list.take_action(
+            self.parser.parse_args(
+                [
+                    "logs-*",
+                    "--health",
+                    "red",
+                    "--status",
+                    "close",
+                    "--sort",
+                    "docs.count:desc",
+                    "--limit",
+                    "2",
+                ]
+            )
+        )
+
+        self.assertEqual([row[0] for row in data], ["logs-1", "logs-2"])
+        url, params = (
+            stream_request.call_args[0][1],
+            stream_request.call_args[1]["params"],
+        )
+        self.assertEqual(url, "/_cat/indices/logs-*")
+        self.assertEqual(params.get("health"), "red")
+        self.assertEqual(params.get("expand_wildcards"), "closed")
+        self.assertEqual(params.get("s"), "docs.count:desc")
+        self.assertFalse(self.index_list.need_sort_by_cliff)
+
+    @patch("esctl.cmd.index.time")
+    @patch("esctl.cmd.index.Esctl")
+    def test_rates(self, Esctl, time):
+        samples = [
+            [
+                {"index": "logs-1", "indexing.index_total": "100"},
+                {"index": "logs-2", "indexing.index_total": "10"},
+            ],
+            [
+                {"index": "logs-1", "indexing.index_total": "120"},
+                {"index": "logs-2", "indexing.index_total": "50"},
+                {"index": "logs-3", "indexing.index_total": "5"},
+            ],
+        ]
+        Esctl._es.transport.stream_request.side_effect = lambda *a, **k: iter(
+            samples.pop(0)
+        )
+        time.monotonic.side_effect = [0, 2]
+
+        column_names, data = self.index_list.take_action(
+            self.parser.parse_args(["--rate", "2"])
+        )
+
+        time.sleep.assert_called_once_with(2)
+        self.assertEqual(column_names, ("Index", "Index/s", "Search/s"))
+        self.assertEqual(
+            list(data), [("logs-2", 20.0, 0.0), ("logs-1", 10.0, 0.0)]
+        )
+
+    @patch("esctl.cmd.index.Esctl")
+    def test_batches_sorted_by_cliff(self, Esctl):
+        Esctl._es.transport.stream_request.side_effect = lambda *a, **k: iter(
+            self.fixture()
+        )
+
+        column_names, data = self.index_list.take_action(
+            self.parser.parse_args(
+                ["a*", "b*", "--batch-size", "1", "--sort", "index"]
+            )
+        )
+
+        self.assertEqual(len(list(data)), 6)
+        self.assertEqual(Esctl._es.transport.stream_request.call_count, 2)
+        self.assertTrue(self.index_list.need_sort_by_cliff)
+
+
+class TestIndexClose(EsctlTestCase):
+    def setUp(self):
+        super()._setUp()
+        self.index_close = esctl.cmd.index.IndexClose(self.app, {})
+        self.index_close.max_names_length = 21
+
+    def fixture(self):
+        return {"acknowledged": True}
+
+    def test_batches_within_length(self):
+        batches = self.index_close.batches(
+            ["logs-1", "logs-2", "logs-3", "logs-4"]
+        )
+
+        self.assertEqual(batches, [["logs-1", "logs-2", "logs-3"], ["logs-4"]])
+
+    @patch("esctl.cmd.index.Esctl")
+    def test_failing_index_isolated(self, Esctl):
+        def close(index):
+            if "missing" in index:
+                raise elasticsearch.NotFoundError(
+                    404,
+                    "index_not_found_exception",
+                    {"error": {"root_cause": [{"reason": "no such index"}]}},
+                )
+            return self.fixture()
+
+        Esctl._es.indices.close.side_effect = close
+
+        results = self.index_close.run_batch(
+            ["logs-1", "logs-2", "missing", "logs-3"]
+        )
+
+        self.assertEqual(
+            results,
+            [
+                ("logs-1", None),
+                ("logs-2", None),
+                ("missing", "no such index"),
+                ("logs-3", None),
+            ],
+        )
+
+    @patch("esctl.cmd.index.Esctl")
+    def test_cluster_error_not_split(self, Esctl):
+        Esctl._es.indices.close.side_effect = elasticsearch.TransportError(
+            503,
+            "cluster_block_exception",
+            {"error": {"root_cause": [{"reason": "blocked"}]}},
+        )
+
+        results = self.index_close.run_batch(["logs-1", "logs-2", "logs-3"])
+        next_results = self.index_close.run_batch(["logs-4"])
+
+        self.assertEqual(
+            results + next_results,
+            [
+                ("logs-1", "blocked"),
+                ("logs-2", "blocked"),
+                ("logs-3", "blocked"),
+                ("logs-4", "blocked"),
+            ],
+        )
+        self.assertEqual(Esctl._es.indices.close.call_count, 1)
@@ -0,0 +1,83 @@
+import argparse
+import io
+import time
+import types
+import unittest
+from unittest.mock import Mock, patch
+
+import esctl.main
+from esctl import transport
+from esctl.cmd.cluster import ClusterHealth
+
+
+class TestFanOut(unittest.TestCase):
+    def setUp(self):
+        self.app = esctl.main.Esctl()
+        self.app.options = argparse.Namespace(context_timeout=0.2, parallel=10)
+        self.app.fanout_contexts = [
+            types.SimpleNamespace(name=name)
+            for name in ("fast", "slow", "broken")
+        ]
+        clients = esctl.main.ContextClients(
+            dict((name, name) for name in ("fast", "slow", "broken"))
+        )
+        patcher = patch.object(esctl.main.Esctl, "_es", clients)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.remaining = []
+
+    def collect(self, parsed_args):
+        context_name = esctl.main.Esctl._es.selected.get()
+        self.remaining.append(transport.remaining_time())
+        if context_name == "slow":
+            time.sleep(1)
+        elif context_name == "broken":
+            raise RuntimeError("boom")
+        return ("Attribute", "Value"), iter([("status", "green")])
+
+    def test_failed_contexts(self):
+        started_at = time.monotonic()
+        column_names, rows, failed = self.app.fan_out(self.collect, None)
+
+        self.assertLess(time.monotonic() - started_at, 0.9)
+        self.assertEqual(column_names, ("Context", "Attribute", "Value"))
+        self.assertEqual(rows, [("fast", "status", "green")])
+        self.assertEqual(sorted(failed), ["broken", "slow"])
+
+    def test_deadline(self):
+        self.app.fan_out(self.collect, None)
+
+        # Every context only has the context timeout, retries included
+        self.assertEqual(len(self.remaining), 3)
+        for remaining in self.remaining:
+            self.assertTrue(0 < remaining <= 0.2)
+        self.assertIsNone(transport.remaining_time())
+
+
+class TestFanOutLister(unittest.TestCase):
+    def setUp(self):
+        self.app = esctl.main.Esctl()
+        self.app.stdout = io.StringIO()
+        self.app.fanout_contexts = ["a", "b"]
+        self.app.fan_out = Mock(
+            return_value=(
+                ("Context", "Attribute", "Value"),
+                [("a", "status", "green")],
+                ["b"],
+            )
+        )
+        self.command = ClusterHealth(self.app, {})
+        self.parser = self.command.get_parser("esctl cluster health")
+
+    def test_failed_context_exit_code(self):
+        self.assertEqual(
+            self.command.run(self.parser.parse_args(["-f", "csv"])), 1
+        )
+
+    def test_context_column_added(self):
+        self.command.run(self.parser.parse_args(["-f", "csv", "-c", "Value"]))
+
+        self.assertEqual(
+            self.app.stdout.getvalue().splitlines(),
+            ['"Context","Value"', '"a","green"'],
+        )
@@ -0,0 +1,110 @@
+import esctl.cmd.node
+from esctl.aggregate import ColumnTable
+from base_test_class import EsctlTestCase
+
+
+class TestNodeList(EsctlTestCase):
+    def setUp(self):
+        super()._setUp()
+        self.node_list = esctl.cmd.node.NodeList(self.app, {})
+        self.parser = self.node_list.get_parser("esctl node list")
+
+    def fixture(self):
+        return []
+
+    def test_all_columns_requested(self):
+        params = self.node_list.cat_params(
+            self.parser.parse_args([]), self.node_list.columns
+        )
+
+        self.assertEqual(
+            params.get("h"),
+            "ip,heap.percent,ram.percent,cpu,load_1m,load_5m,load_15m,"
+            "node.role,master,name",
+        )
+        self.assertNotIn("s", params)
+        self.assertTrue(self.node_list.need_sort_by_cliff)
+
+    def test_selected_columns_and_sort_pushed_down(self):
+        params = self.node_list.cat_params(
+            self.parser.parse_args(
+                ["-c", "Name", "-c", "Heap %", "--sort-column", "Heap %"]
+            ),
+            self.node_list.columns,
+        )
+
+        self.assertEqual(params.get("h"), "name,heap.percent")
+        self.assertEqual(params.get("s"), "heap.percent")
+        self.assertFalse(self.node_list.need_sort_by_cliff)
+
+
+class TestNodeStats(EsctlTestCase):
+    def setUp(self):
+        super()._setUp()
+        self.node_stats = esctl.cmd.node.NodeStats(self.app, {})
+
+    def fixture(self):
+        return {}
+
+    def node(self, name, roles, heap, rejected=0):
+        return {
+            "name": name,
+            "roles": roles,
+            "jvm": {
+                "mem": {"heap_used_percent": heap},
+                "gc": {
+                    "collectors": {
+                        "young": {"collection_time_in_millis": 100},
+                        "old": {"collection_time_in_millis": 20},
+                    }
+                },
+            },
+            "os": {"cpu": {"percent": 10}},
+            "fs": {"total": {"total_in_bytes": 200, "available_in_bytes": 50}},
+            "thread_pool": {
+                "write": {"rejected": rejected},
+                "search": {"rejected": 1},
+            },
+        }
+
+    def test_node_metrics(self):
+        self.assertEqual(
+            self.node_stats.node_metrics(
+                self.node("node1", ["master", "data", "ingest"], 40, 3)
+            ),
+            {
+                "name": "node1",
+                "role": "dim",
+                "heap": 40,
+                "cpu": 10,
+                "disk": 75,
+                "gc": 120,
+                "rejected": 4,
+            },
+        )
+
+    def test_summary_and_roles(self):
+        nodes = ColumnTable(
+            text_columns=("name", "role"),
+            numeric_columns=tuple(self.node_stats.metrics),
+        ).extend(
+            self.node_stats.node_metrics(node)
+            for node in [
+                self.node("node{}".format(i), ["data"], 40 + i)
+                for i in range(8)
+            ]
+            + [self.node("hot", ["data"], 98), self.node("master", [], 20)]
+        )
+
+        columns, rows = self.node_stats.summary(nodes, max_outliers=3)
+        rows = list(rows)
+        heap = dict(zip(columns, rows[0]))
+        self.assertEqual(heap["Metric"], "Heap %")
+        self.assertEqual((heap["Min"], heap["Max"]), (20, 98))
+        self.assertEqual(heap["Outliers"], "hot (98)")
+
+        columns, rows = self.node_stats.roles(nodes)
+        rows = list(rows)
+        self.assertEqual(
+            [row[:3] for row in rows], [("d", 9, 49), ("-", 1, 20)]
+        )
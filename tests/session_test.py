@@ -0,0 +1,48 @@
+import unittest
+from unittest.mock import Mock
+
+from esctl.cmd.settings import ClusterSettings
+from esctl.session import ClusterMetadata
+
+
+class TestClusterMetadata(unittest.TestCase):
+    def setUp(self):
+        client = Mock()
+        client.cat.indices.return_value = [{"index": "b"}, {"index": "a"}]
+        client.cluster.get_settings.return_value = {
+            "persistent": {"logger.discovery": "DEBUG"},
+            "transient": {"logger.transport": "TRACE", "node.attr": "a"},
+        }
+        self.client = client
+        self.metadata = ClusterMetadata(client)
+
+    def tearDown(self):
+        ClusterSettings.invalidate()
+
+    def test_refresh(self):
+        self.metadata.refresh()
+
+        self.assertEqual(self.metadata.indices, ["a", "b"])
+        self.assertIsNotNone(self.metadata.refreshed_at)
+        self.client.cluster.get_settings.assert_called_once_with(
+            flat_settings=True
+        )
+        self.assertIs(ClusterSettings.snapshot, self.metadata.snapshot)
+
+    def test_loggers(self):
+        self.metadata.refresh()
+
+        self.assertEqual(
+            self.metadata.loggers, ["logger.discovery", "logger.transport"]
+        )
+
+    def test_refresh_does_not_restore_invalidated_settings(self):
+        def get_settings(**kwargs):
+            # Settings changed while they were being fetched
+            ClusterSettings.invalidate()
+            return {"persistent": {}, "transient": {}}
+
+        self.client.cluster.get_settings.side_effect = get_settings
+        self.metadata.refresh()
+
+        self.assertIsNone(ClusterSettings.snapshot)
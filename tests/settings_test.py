@@ -0,0 +1,161 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+from esctl.cmd.settings import (
+    ClusterSettings,
+    SettingsSnapshot,
+    read_settings,
+    write_changes,
+)
+
+SETTINGS = {
+    "persistent": {"logger.org.elasticsearch.discovery": "debug"},
+    "transient": {
+        "logger.org.elasticsearch.discovery": "trace",
+        "logger.org.elasticsearch.transport": "info",
+        "cluster.routing.allocation.enable": "all",
+    },
+}
+
+
+class TestSettingsSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.snapshot = SettingsSnapshot(SETTINGS)
+
+    def test_keys(self):
+        self.assertEqual(
+            self.snapshot.keys("logger.org"),
+            [
+                "logger.org.elasticsearch.discovery",
+                "logger.org.elasticsearch.transport",
+            ],
+        )
+        self.assertEqual(self.snapshot.keys("logger.org.elasticsearch.x"), [])
+
+    def test_match(self):
+        self.assertEqual(len(self.snapshot.match("logger.*")), 2)
+        self.assertEqual(
+            self.snapshot.match("cluster.routing.allocation.enable"),
+            ["cluster.routing.allocation.enable"],
+        )
+        self.assertEqual(self.snapshot.match("cluster.routing"), [])
+
+
+class TestClusterSettings(unittest.TestCase):
+    def setUp(self):
+        self.client = Mock()
+        self.client.cluster.get_settings.return_value = SETTINGS
+        self.patcher = patch("esctl.cmd.settings.Esctl._es", self.client)
+        self.patcher.start()
+        self.settings = ClusterSettings()
+
+    def tearDown(self):
+        self.patcher.stop()
+        ClusterSettings.invalidate()
+
+    def test_fetched_once(self):
+        self.assertEqual(
+            self.settings.get("logger.org.elasticsearch.discovery"), "TRACE"
+        )
+        self.assertEqual(
+            self.settings.find("logger.*", persistency="persistent"),
+            {"logger.org.elasticsearch.discovery": "DEBUG"},
+        )
+
+        self.client.cluster.get_settings.assert_called_once_with(
+            include_defaults=False, flat_settings=True
+        )
+
+    def test_defaults_fetched_when_needed(self):
+        self.settings.get("cluster.routing.allocation.enable")
+        self.settings.get("cluster.name", persistency="defaults")
+
+        self.client.cluster.get_settings.assert_called_with(
+            include_defaults=True, flat_settings=True
+        )
+        self.assertEqual(self.client.cluster.get_settings.call_count, 2)
+
+    def test_invalidated_by_set(self):
+        self.settings.get("cluster.routing.allocation.enable")
+        self.settings.set("cluster.routing.allocation.enable", "none")
+        self.settings.get("cluster.routing.allocation.enable")
+
+        self.assertEqual(self.client.cluster.get_settings.call_count, 2)
+
+    def test_set_many(self):
+        self.settings.set_many(
+            {"logger.discovery": "DEBUG", "logger.transport": None}
+        )
+
+        self.client.cluster.put_settings.assert_called_once_with(
+            body={
+                "transient": {
+                    "logger.discovery": "DEBUG",
+                    "logger.transport": None,
+                }
+            }
+        )
+
+    def test_diff(self):
+        changes = self.settings.diff(
+            {
+                "logger.org.elasticsearch.discovery": "trace",
+                "logger.org.elasticsearch.transport": "info",
+                "logger.org.elasticsearch.http": "debug",
+            }
+        )
+        self.assertEqual(
+            changes, [("logger.org.elasticsearch.http", None, "debug")]
+        )
+        self.client.cluster.put_settings.assert_not_called()
+
+        output = io.StringIO()
+        write_changes(output, changes)
+        self.assertEqual(
+            output.getvalue(),
+            "logger.org.elasticsearch.http : (unset) -> debug\n",
+        )
+
+    def test_diff_boolean(self):
+        self.client.cluster.get_settings.return_value = {
+            "persistent": {},
+            "transient": {
+                "cluster.routing.rebalance.enable": "all",
+                "action.destructive_requires_name": "true",
+            },
+        }
+
+        changes = self.settings.diff(
+            {
+                "action.destructive_requires_name": True,
+                "cluster.max_shards_per_node": 2000,
+            }
+        )
+
+        self.assertEqual(
+            changes, [("cluster.max_shards_per_node", None, "2000")]
+        )
+
+
+class TestReadSettings(unittest.TestCase):
+    def test_assignments(self):
+        self.assertEqual(
+            list(read_settings(["a.b=DEBUG", "c = ", "d=x=y"]).items()),
+            [("a.b", "DEBUG"), ("c", None), ("d", "x=y")],
+        )
+        with self.assertRaises(ValueError):
+            read_settings(["a.b"])
+
+    def test_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "settings.yml")
+            with open(path, "w") as settings_file:
+                settings_file.write("logger:\n  discovery: DEBUG\n")
+
+            self.assertEqual(
+                list(read_settings(["logger.http=TRACE"], path).items()),
+                [("logger.discovery", "DEBUG"), ("logger.http", "TRACE")],
+            )
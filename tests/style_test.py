@@ -0,0 +1,47 @@
+import unittest
+
+from esctl.style import Threshold, Values, style_rows
+from esctl.utils import Color
+
+
+class TestStyleRows(unittest.TestCase):
+    def test_threshold(self):
+        rule = Threshold("Disk %", ((75, Color.YELLOW), (90, Color.RED)))
+
+        self.assertEqual(rule.color("95"), Color.RED)
+        self.assertEqual(rule.color(80), Color.YELLOW)
+        self.assertIsNone(rule.color("50"))
+        self.assertIsNone(rule.color(None))
+
+    def test_only_colored_rows_are_copied(self):
+        rows = [("node1", "95"), ("node2", "50")]
+
+        styled = list(
+            style_rows(
+                ("Node", "Disk %"),
+                iter(rows),
+                [Threshold("Disk %", ((90, Color.RED),))],
+            )
+        )
+
+        self.assertEqual(styled[0], ["node1", "\x1b[91m95\x1b[0m"])
+        self.assertIs(styled[1], rows[1])
+
+    def test_where(self):
+        rows = [("cluster_name", "red"), ("status", "red")]
+        rule = Values(
+            "Value", {"red": Color.RED}, where=("Attribute", "status")
+        )
+
+        self.assertEqual(
+            list(style_rows(("Attribute", "Value"), rows, [rule])),
+            [("cluster_name", "red"), ["status", "\x1b[91mred\x1b[0m"]],
+        )
+
+    def test_unknown_columns(self):
+        rows = [("node1", "95")]
+        rule = Threshold("Heap %", ((90, Color.RED),))
+
+        self.assertEqual(
+            list(style_rows(("Node", "Disk %"), rows, [rule])), rows
+        )
@@ -0,0 +1,76 @@
+import io
+import json
+import time
+import unittest
+
+from esctl import trace
+
+
+class TestTracer(unittest.TestCase):
+    def setUp(self):
+        self.tracer = trace.Tracer()
+        trace.activate(self.tracer)
+
+    def tearDown(self):
+        trace.activate(None)
+
+    def test_phases(self):
+        record = self.tracer.start_request("GET", "/_cat/nodes", "http://es")
+        record["elapsed"] = 0.5
+        with trace.phase("deserialize", request=True):
+            pass
+        with trace.phase("render"):
+            pass
+
+        self.assertIn("deserialize", record)
+        self.assertIn("render", self.tracer.phases)
+        self.assertEqual(
+            list(self.tracer.summary()),
+            ["total", "requests", "deserialize", "render", "other"],
+        )
+        self.assertEqual(self.tracer.summary()["requests"], 0.5)
+
+    def test_streamed_download_left_out_of_phase(self):
+        record = self.tracer.start_request("GET", "/_cat/shards", "http://es")
+        with trace.phase("render"):
+            # A streamed response read while rendering
+            time.sleep(0.02)
+            record["elapsed"] = 0.02
+            trace.exclude(0.02)
+
+        self.assertLess(self.tracer.phases["render"], 0.01)
+        summary = self.tracer.summary()
+        self.assertAlmostEqual(
+            summary["requests"] + summary["render"] + summary["other"],
+            summary["total"],
+        )
+
+    def test_phase_without_tracer(self):
+        trace.activate(None)
+        with trace.phase("render"):
+            pass
+
+        self.assertEqual(self.tracer.phases, {})
+
+    def test_report(self):
+        record = self.tracer.start_request("GET", "/_cat/nodes", "http://es")
+        record.update(status=200, ttfb=0.01, size=2000, wire_size=500)
+
+        table = io.StringIO()
+        self.tracer.report(table)
+        header, row, summary = table.getvalue().splitlines()
+        self.assertTrue(header.startswith("Request"))
+        self.assertEqual(
+            row.split(),
+            ["GET", "http://es/_cat/nodes", "200"]
+            + ["-", "-", "-", "10.0", "-", "-"]
+            + ["2000", "500", "4.0"],
+        )
+        self.assertTrue(summary.startswith("total"))
+
+        lines = io.StringIO()
+        self.tracer.report(lines, output_format="json")
+        request, command = map(json.loads, lines.getvalue().splitlines())
+        self.assertEqual(request["type"], "request")
+        self.assertEqual(request["ttfb"], 0.01)
+        self.assertEqual(command["type"], "command")
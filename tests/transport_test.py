@@ -0,0 +1,213 @@
+import gzip
+import io
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+from elasticsearch import ConnectionError, ConnectionTimeout
+from elasticsearch.connection_pool import ConnectionPool
+from urllib3 import HTTPResponse
+
+from esctl.cache import ResponseCache
+from esctl.transport import (
+    EsctlConnectionPool,
+    EsctlTransport,
+    EsctlUrllib3HttpConnection,
+    LatencySelector,
+    deadline,
+)
+
+
+class TestLatencySelector(unittest.TestCase):
+    def setUp(self):
+        self.selector = LatencySelector({})
+
+    def test_unmeasured_connection_first(self):
+        connections = [Mock(latency=0.01), Mock(latency=None)]
+
+        self.assertIs(self.selector.select(connections), connections[1])
+
+    def test_fastest_connection(self):
+        connections = [Mock(latency=0.3), Mock(latency=0.01), Mock(latency=1)]
+
+        self.assertIs(self.selector.select(connections), connections[1])
+
+
+class TestEsctlTransport(unittest.TestCase):
+    def setUp(self):
+        self.transport = EsctlTransport(
+            [{"host": "node1"}, {"host": "node2"}],
+            connection_pool_class=ConnectionPool,
+            retry_budget=2,
+        )
+        self.slow, self.fast = self.transport.connection_pool.connections
+
+    def test_backoff(self):
+        for attempt in range(10):
+            self.assertLessEqual(
+                self.transport.backoff(attempt),
+                min(5.0, self.transport.retry_backoff * 2**attempt),
+            )
+
+    def test_retry_budget(self):
+        self.assertTrue(self.transport._take_retry())
+        self.assertTrue(self.transport._take_retry())
+        self.assertFalse(self.transport._take_retry())
+
+        self.transport.reset_retry_budget()
+        self.assertTrue(self.transport._take_retry())
+
+    def test_hedge_delay(self):
+        self.slow.samples.extend([0.01] * 10)
+        self.assertIsNone(self.transport.hedge_delay())
+
+        self.fast.samples.extend([0.01] * 9 + [1])
+        self.assertEqual(self.transport.hedge_delay(), 1)
+
+    def test_hedged_request(self):
+        def answer(delay, response):
+            def perform_request(*args, **kwargs):
+                time.sleep(delay)
+                return response
+
+            return perform_request
+
+        self.slow.perform_request = answer(1, "slow")
+        self.fast.perform_request = answer(0, "fast")
+
+        self.assertEqual(
+            self.transport._hedged_request(self.slow, 0.01, "GET", "/"),
+            (self.fast, "fast"),
+        )
+
+    def test_deadline_caps_timeout(self):
+        for connection in (self.slow, self.fast):
+            connection.perform_request = Mock(
+                return_value=(200, {}, '{"status": "green"}')
+            )
+
+        with deadline(5):
+            self.transport.perform_request("GET", "/_cluster/health")
+
+        connection = (
+            self.slow if self.slow.perform_request.called else self.fast
+        )
+        timeout = connection.perform_request.call_args[1]["timeout"]
+        self.assertTrue(4 < timeout <= 5)
+
+    def test_no_retry_after_deadline(self):
+        for connection in (self.slow, self.fast):
+            connection.perform_request = Mock(
+                side_effect=ConnectionError("N/A", "refused", None)
+            )
+
+        with deadline(0.001):
+            with self.assertRaises(ConnectionError):
+                self.transport.perform_request("GET", "/_cluster/health")
+
+        self.assertEqual(
+            self.slow.perform_request.call_count
+            + self.fast.perform_request.call_count,
+            1,
+        )
+
+        with deadline(0):
+            with self.assertRaises(ConnectionTimeout):
+                self.transport.perform_request("GET", "/_cluster/health")
+
+    def test_read_only_post_keeps_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with patch.dict(os.environ, {"XDG_CACHE_HOME": directory}):
+                cache = ResponseCache("test", ttls={"_cat/*": 30})
+                self.transport.response_cache = cache
+                self.transport._perform_request = Mock(return_value={})
+                key = cache.key("GET", "/_cat/nodes", None, None)
+                cache.set(key, [{"name": "node1"}])
+
+                self.transport.perform_request(
+                    "POST", "/_cluster/allocation/explain", body={}
+                )
+                self.transport.perform_request("POST", "/logs-*/_search")
+                self.assertEqual(cache.get(key, 30), [{"name": "node1"}])
+
+                self.transport.perform_request("POST", "/logs/_close")
+                self.assertIsNone(cache.get(key, 30))
+
+class TestEsctlConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        patcher = patch.dict(
+            os.environ, {"XDG_CACHE_HOME": self.directory.name}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.pool = EsctlConnectionPool(
+            [
+                (EsctlUrllib3HttpConnection(host=host), {})
+                for host in ("node1", "node2")
+            ]
+        )
+        self.node1, self.node2 = self.pool.orig_connections
+
+    def test_state_saved_on_changes_only(self):
+        with patch.object(self.pool, "_save_state") as save_state:
+            self.pool.mark_live(self.node1)
+            self.assertFalse(save_state.called)
+
+            self.pool.mark_dead(self.node1)
+            self.pool.mark_live(self.node1)
+            self.assertEqual(save_state.call_count, 2)
+
+    def test_latencies_saved_at_exit(self):
+        with patch.object(self.pool, "_save_state") as save_state:
+            self.pool.save_latencies()
+            self.assertFalse(save_state.called)
+
+            self.node2.record_latency(0.01)
+            self.pool.save_latencies()
+            self.assertTrue(save_state.called)
+
+    def test_state_loaded(self):
+        self.node2.record_latency(0.01)
+        self.pool.mark_dead(self.node1)
+
+        pool = EsctlConnectionPool(
+            [
+                (EsctlUrllib3HttpConnection(host=host), {})
+                for host in ("node1", "node2")
+            ]
+        )
+
+        self.assertEqual(
+            [connection.host for connection in pool.connections],
+            ["http://node2:9200"],
+        )
+
+
+class TestEsctlUrllib3HttpConnection(unittest.TestCase):
+    def test_compression_negotiated(self):
+        connection = EsctlUrllib3HttpConnection(http_compress=True)
+
+        self.assertEqual(connection.headers["accept-encoding"], "gzip,deflate")
+
+    def test_gzip_response_decompressed(self):
+        connection = EsctlUrllib3HttpConnection()
+        body = b'{"index": "foo"}' * 1000
+        response = HTTPResponse(
+            body=io.BytesIO(gzip.compress(body)),
+            headers={"content-encoding": "gzip"},
+            preload_content=False,
+        )
+        transfer = {"size": 0, "wire_size": 0}
+
+        chunks = list(
+            connection._read_chunks(response, transfer, chunk_size=64)
+        )
+
+        self.assertEqual(b"".join(chunks), body)
+        self.assertEqual(transfer["size"], len(body))
+        self.assertLess(transfer["wire_size"], len(body) / 10)
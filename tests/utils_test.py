@@ -0,0 +1,155 @@
+import json
+import time
+import unittest
+
+from esctl.main import ContextClients
+from esctl.utils import flatten_dict, gather, iter_json_array
+
+
+class TestIterJsonArray(unittest.TestCase):
+    def chunked(self, document, size):
+        data = json.dumps(document).encode("utf-8")
+        return [data[i : i + size] for i in range(0, len(data), size)]
+
+    def test_elements_split_across_chunks(self):
+        document = [
+            {"index": "logs-{}".format(i), "héalth": "green"}
+            for i in range(20)
+        ]
+
+        for size in (1, 3, 64, 4096):
+            self.assertEqual(
+                list(iter_json_array(self.chunked(document, size))), document
+            )
+
+    def test_number_at_end_of_chunk(self):
+        self.assertEqual(
+            list(iter_json_array([b"[12", b"34, 5", b"6]"])), [1234, 56]
+        )
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array([b" [ ", b"] "])), [])
+
+    def test_truncated_array(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'[{"a": 1}, {"b"']))
+
+    def test_not_an_array(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'{"a": 1}']))
+
+
+class TestFlattenDict(unittest.TestCase):
+    def setUp(self):
+        self.document = {
+            "status": "green",
+            "nodes": {
+                "count": {"total": 3},
+                "jvm": {
+                    "versions": [
+                        {"version": "11", "count": 2},
+                        {"version": "14", "count": 1},
+                    ]
+                },
+                "versions": ["7.10.1"],
+            },
+        }
+
+    def test_nested(self):
+        self.assertEqual(
+            flatten_dict(self.document),
+            {
+                "status": "green",
+                "nodes.count.total": 3,
+                "nodes.jvm.versions": self.document["nodes"]["jvm"][
+                    "versions"
+                ],
+                "nodes.versions": ["7.10.1"],
+            },
+        )
+
+    def test_expand_lists(self):
+        flat = flatten_dict(self.document, expand_lists=True)
+
+        self.assertEqual(flat["nodes.jvm.versions[1].version"], "14")
+        self.assertEqual(flat["nodes.versions"], ["7.10.1"])
+        self.assertNotIn("nodes.jvm.versions", flat)
+
+    def test_globs(self):
+        self.assertEqual(
+            flatten_dict(
+                self.document,
+                include=["nodes.jvm.*", "status"],
+                exclude=["**.count"],
+                expand_lists=True,
+            ),
+            {
+                "status": "green",
+                "nodes.jvm.versions[0].version": "11",
+                "nodes.jvm.versions[1].version": "14",
+            },
+        )
+
+
+    def test_globs_through_lists(self):
+        self.assertEqual(
+            flatten_dict(
+                self.document,
+                include=["nodes.jvm.versions.*"],
+                expand_lists=True,
+            ),
+            {
+                "nodes.jvm.versions[0].version": "11",
+                "nodes.jvm.versions[0].count": 2,
+                "nodes.jvm.versions[1].version": "14",
+                "nodes.jvm.versions[1].count": 1,
+            },
+        )
+        self.assertEqual(
+            flatten_dict(
+                self.document,
+                include=["nodes.jvm.versions[1].version"],
+                expand_lists=True,
+            ),
+            {"nodes.jvm.versions[1].version": "14"},
+        )
+        self.assertEqual(
+            flatten_dict(
+                self.document,
+                include=["nodes.**"],
+                exclude=["nodes.jvm.versions.count", "nodes.count"],
+                expand_lists=True,
+            ),
+            {
+                "nodes.jvm.versions[0].version": "11",
+                "nodes.jvm.versions[1].version": "14",
+                "nodes.versions": ["7.10.1"],
+            },
+        )
+
+class TestGather(unittest.TestCase):
+    def test_concurrent_results_in_order(self):
+        def call(result, delay):
+            return lambda: time.sleep(delay) or result
+
+        started_at = time.monotonic()
+        results = gather(call(1, 0.2), call(2, 0.1), call(3, 0.2))
+
+        self.assertEqual(results, [1, 2, 3])
+        self.assertLess(time.monotonic() - started_at, 0.4)
+
+    def test_error_raised(self):
+        def fail():
+            raise ValueError("failed")
+
+        with self.assertRaises(ValueError):
+            gather(lambda: 1, fail)
+
+    def test_context_client_kept(self):
+        clients = ContextClients({"foo": "client of foo", "bar": "bar"})
+        clients.use("foo")
+
+        self.assertEqual(
+            gather(lambda: clients.upper(), lambda: clients.upper()),
+            ["CLIENT OF FOO", "CLIENT OF FOO"],
+        )
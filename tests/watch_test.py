@@ -0,0 +1,53 @@
+import io
+import unittest
+
+from esctl.watch import WatchScreen, highlight_changes
+
+
+class TestHighlightChanges(unittest.TestCase):
+    def test_changed_cells(self):
+        previous_rows = [("node1", "45", "d"), ("node2", "50", "d")]
+        rows = [
+            ("node2", "53", "d"),
+            ("node1", "45", "m"),
+            ("node3", "1", "d"),
+        ]
+
+        self.assertEqual(
+            list(highlight_changes(previous_rows, rows)),
+            [
+                ("node2", "\x1b[7m53 (+3)\x1b[0m", "d"),
+                ("node1", "45", "\x1b[7mm\x1b[0m"),
+                ("node3", "1", "d"),
+            ],
+        )
+
+    def test_key_indexes(self):
+        previous_rows = [("a", "status", "green"), ("b", "status", "red")]
+        rows = [("a", "status", "green"), ("b", "status", "green")]
+
+        self.assertEqual(
+            list(highlight_changes(previous_rows, rows, key_indexes=(0, 1))),
+            [("a", "status", "green"), ("b", "status", "\x1b[7mgreen\x1b[0m")],
+        )
+
+
+class FakeTerminal(io.StringIO):
+    def isatty(self):
+        return True
+
+
+class TestWatchScreen(unittest.TestCase):
+    def test_only_changed_lines_are_redrawn(self):
+        terminal = FakeTerminal()
+        screen = WatchScreen(terminal, "title")
+
+        screen.draw("a\nb\nc\n")
+        terminal.seek(0)
+        terminal.truncate()
+        screen.draw("a\nB\n")
+
+        output = terminal.getvalue()
+        self.assertIn("\x1b[3;1HB\x1b[K", output)
+        self.assertNotIn("\x1b[2;1Ha", output)
+        self.assertTrue(output.endswith("\x1b[4;1H\x1b[J"))